@@ -0,0 +1,138 @@
+# benchmarks/bench_chart_frames.py
+"""
+Benchmark building the chart DataFrames from model instances versus columns.
+
+Builds a throwaway test database with one item traded --rows times, then
+loads (date_of_holding, realised_profit) for that item three ways: the old
+per-instance loop (`for t in qs: rows.append({...})`), a list of
+values_list() tuples handed to pandas, and trades.charts.queryset_frame(),
+which streams values_list() chunks into preallocated NumPy arrays. Reports
+the median wall time and the peak Python allocation (tracemalloc, measured
+in a separate run since tracing slows everything down), then times
+item_profit_series() end to end. Run from the project root:
+
+    python benchmarks/bench_chart_frames.py --rows 500000
+"""
+import argparse
+import gc
+import os
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'trade_tracker.settings')
+
+import django
+django.setup()
+
+import pandas as pd
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test.runner import DiscoverRunner
+from django.test.utils import setup_test_environment
+
+from trades.charts import item_profit_series, queryset_frame
+from trades.models import Item, Transaction
+
+
+def populate(n_rows, rng):
+    user = User.objects.create_user(username='bench-frames', password='pw')
+    item = Item.objects.create(name='Bench item')
+    start = datetime(2015, 1, 1, tzinfo=timezone.utc)
+    Transaction.objects.bulk_create(
+        (
+            Transaction(
+                user=user, item=item, trans_type=rng.choice([Transaction.BUY, Transaction.SELL]),
+                price=rng.randint(100, 1000), quantity=rng.randint(1, 50),
+                realised_profit=rng.uniform(-500, 500),
+                date_of_holding=start + timedelta(minutes=rng.randrange(10 * 365 * 24 * 60)),
+            )
+            for _ in range(n_rows)
+        ),
+        batch_size=5000,
+    )
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE trades_transaction')
+    return user, item
+
+
+def loaders(user, item):
+    """The ways of getting the item's history into a DataFrame."""
+    def history():
+        # A fresh queryset each time, so no run reads another's result cache
+        return Transaction.objects.filter(user=user, item=item).order_by('date_of_holding', 'id')
+
+    def instances():
+        rows = []
+        for t in history():
+            rows.append({'date': t.date_of_holding, 'realised_profit': t.realised_profit})
+        df = pd.DataFrame(rows)
+        df['date'] = pd.to_datetime(df['date'])
+        return df
+
+    def tuples():
+        df = pd.DataFrame(list(history().values_list('date_of_holding', 'realised_profit')),
+                          columns=['date', 'realised_profit'])
+        df['date'] = pd.to_datetime(df['date'])
+        return df
+
+    def columns():
+        return queryset_frame(history(), {'date_of_holding': 'datetime64[ns]', 'realised_profit': 'float64'})
+
+    return [('model instances', instances), ('values_list tuples', tuples), ('queryset_frame', columns)]
+
+
+def time_call(call, repeat):
+    runs = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        result = call()
+        runs.append(time.perf_counter() - start)
+        del result
+    return statistics.median(runs)
+
+
+def peak_memory(call):
+    gc.collect()
+    tracemalloc.start()
+    try:
+        result = call()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    del result
+    return peak / (1024 * 1024)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=500_000)
+    parser.add_argument('--repeat', type=int, default=3, help='Timed runs per loader (median reported).')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    setup_test_environment()
+    runner = DiscoverRunner(verbosity=0)
+    old_config = runner.setup_databases()
+    try:
+        user, item = populate(args.rows, random.Random(args.seed))
+        print(f"{connection.vendor}: one item with {args.rows} transactions")
+        print(f"{'loader':22} {'median s':>9} {'peak MiB':>9}")
+        for label, call in loaders(user, item):
+            elapsed = time_call(call, args.repeat)
+            print(f"{label:22} {elapsed:>9.3f} {peak_memory(call):>9.1f}")
+        for timeframe in ('Daily', 'Monthly'):
+            elapsed = time_call(lambda: item_profit_series(user, item, timeframe), args.repeat)
+            print(f"item_profit_series({timeframe}): {elapsed:.3f}s")
+    finally:
+        runner.teardown_databases(old_config)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,201 @@
+# benchmarks/bench_fifo.py
+"""
+FIFO and chart benchmark suite on synthetic data.
+
+Builds a throwaway test database, fills it with `generate_synthetic_trades`
+and times a full replay, an incremental edit, the all-user recompute and the
+chart views. Results are written as JSON so runs from different versions can
+be compared. Run from the project root:
+
+    python benchmarks/bench_fifo.py --users 5 --items 20 --trades 200 --output bench.json
+    python benchmarks/bench_fifo.py --compare bench.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone as dt_timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'trade_tracker.settings')
+
+import django
+django.setup()
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client
+from django.test.runner import DiscoverRunner
+from django.test.utils import setup_test_environment, override_settings
+
+from trades.fifo import FIFO_ENGINES, PLACING_TYPES, calculate_fifo_for_all_users, calculate_fifo_for_user, get_fifo_engine
+from trades.models import Item, Transaction
+
+PREFIX = 'bench_'
+
+
+def timed(func, repeat):
+    """Run `func` `repeat` times and return the timings in seconds."""
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            func()
+        runs.append(time.perf_counter() - start)
+    return runs
+
+
+def summarise(runs, **extra):
+    result = {
+        'runs': [round(r, 6) for r in runs],
+        'min': round(min(runs), 6),
+        'median': round(statistics.median(runs), 6),
+    }
+    result.update(extra)
+    return result
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_suite(args):
+    User = get_user_model()
+    users = list(User.objects.filter(username__startswith=PREFIX).order_by('id'))
+    # The user with the most history drives the single-user benchmarks
+    user = max(users, key=lambda u: Transaction.objects.filter(user=u).count())
+    user_rows = Transaction.objects.filter(user=user).exclude(trans_type__in=PLACING_TYPES).count()
+    total_rows = Transaction.objects.filter(user__in=users).exclude(trans_type__in=PLACING_TYPES).count()
+    results = {}
+
+    for engine in FIFO_ENGINES:
+        recalc = get_fifo_engine(engine)
+        runs = timed(lambda: recalc(user), args.repeat)
+        results[f'full_replay.{engine}'] = summarise(
+            runs, transactions=user_rows, transactions_per_sec=round(user_rows / statistics.median(runs)),
+        )
+
+    # Edit a transaction halfway through the user's history, then replay its item from there
+    target = (
+        Transaction.objects.filter(user=user).exclude(trans_type__in=PLACING_TYPES)
+        .order_by('date_of_holding', 'id')[user_rows // 2]
+    )
+
+    def incremental_edit():
+        target.quantity += 1
+        target.save(update_fields=['quantity'])
+        calculate_fifo_for_user(user, since=target.date_of_holding, items=[target.item_id])
+
+    results['incremental_edit'] = summarise(timed(incremental_edit, args.repeat))
+
+    for engine in FIFO_ENGINES:
+        runs = timed(lambda: calculate_fifo_for_all_users(engine=engine), args.repeat)
+        results[f'all_user_recompute.{engine}'] = summarise(
+            runs, users=len(users), transactions=total_rows,
+            transactions_per_sec=round(total_rows / statistics.median(runs)),
+        )
+
+    client = Client()
+    client.force_login(user)
+    item_name = Item.objects.filter(transaction__user=user).values_list('name', flat=True).first()
+    charts = {
+        'global_profit': ('/charts/global-profit/', {}),
+        'item_price': ('/charts/item-price/', {'search': item_name}),
+        'item_profit': ('/charts/item-profit/', {'search': item_name}),
+    }
+    for name, (url, params) in charts.items():
+        for timeframe in ('Daily', 'Monthly'):
+            def render():
+                response = client.get(url, {**params, 'timeframe': timeframe})
+                assert response.status_code == 200, f"{url} returned {response.status_code}"
+            results[f'chart.{name}.{timeframe.lower()}'] = summarise(timed(render, args.repeat))
+
+    return results
+
+
+def compare(results, baseline_path, threshold):
+    """
+    Print each benchmark's median against a saved run (to stderr, so stdout
+    stays valid JSON); returns True if any got slower than `threshold`.
+    """
+    with open(baseline_path) as fh:
+        baseline = json.load(fh)['results']
+    regressed = False
+    print(f"{'benchmark':40} {'baseline':>10} {'current':>10} {'ratio':>7}", file=sys.stderr)
+    for name, result in results.items():
+        if name not in baseline:
+            print(f"{name:40} {'-':>10} {result['median']:>10.4f}", file=sys.stderr)
+            continue
+        ratio = result['median'] / baseline[name]['median'] if baseline[name]['median'] else float('inf')
+        flag = '  SLOWER' if ratio > threshold else ''
+        regressed = regressed or ratio > threshold
+        print(f"{name:40} {baseline[name]['median']:>10.4f} {result['median']:>10.4f} {ratio:>6.2f}x{flag}", file=sys.stderr)
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--users', type=int, default=5)
+    parser.add_argument('--items', type=int, default=20)
+    parser.add_argument('--trades', type=int, default=200, help='Trades per user per item.')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--repeat', type=int, default=3, help='Timed runs per benchmark.')
+    parser.add_argument('--output', help='Write the JSON results to this file (default: stdout).')
+    parser.add_argument('--compare', help='A previous JSON result to compare the medians against.')
+    parser.add_argument('--threshold', type=float, default=1.2,
+                        help='With --compare, exit non-zero if a median is this many times slower.')
+    args = parser.parse_args()
+
+    setup_test_environment()
+    runner = DiscoverRunner(verbosity=0)
+    old_config = runner.setup_databases()
+    try:
+        # Time the inline recompute path, whatever the site is configured to do
+        with override_settings(FIFO_BACKGROUND_RECOMPUTE=False), contextlib.redirect_stdout(io.StringIO()):
+            call_command(
+                'generate_synthetic_trades', users=args.users, items=args.items, trades=args.trades,
+                seed=args.seed, prefix=PREFIX,
+            )
+        with override_settings(FIFO_BACKGROUND_RECOMPUTE=False):
+            results = run_suite(args)
+    finally:
+        runner.teardown_databases(old_config)
+
+    report = {
+        'meta': {
+            'timestamp': datetime.now(dt_timezone.utc).isoformat(),
+            'git_revision': git_revision(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'params': {k: getattr(args, k) for k in ('users', 'items', 'trades', 'seed', 'repeat')},
+        },
+        'results': results,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as fh:
+            fh.write(output + '\n')
+        print(f"Results written to {args.output}", file=sys.stderr)
+    else:
+        print(output)
+
+    if args.compare and compare(results, args.compare, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
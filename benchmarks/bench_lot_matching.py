@@ -0,0 +1,83 @@
+# benchmarks/bench_lot_matching.py
+"""
+Micro-benchmark for FIFO lot matching on a single item with many small lots.
+
+Compares the old list-based sell path (enumerate + pop(index)) with the
+deque-based trades.fifo._consume_lots. Run from the project root:
+
+    python benchmarks/bench_lot_matching.py --lots 100000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from collections import deque
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'trade_tracker.settings')
+
+import django
+django.setup()
+
+from trades.fifo import _consume_lots, LOT_EPSILON
+
+
+def legacy_consume_lots(lots, quantity):
+    # The sell branch as it was before the deque change
+    cost_basis = 0.0
+    indices_to_remove = []
+    qty_sold_from_lots = 0
+    for i, lot in enumerate(lots):
+        if qty_sold_from_lots >= quantity:
+            break
+        use_from_lot = min(quantity - qty_sold_from_lots, lot['qty'])
+        if use_from_lot <= 0: continue
+        cost_basis += use_from_lot * lot['price']
+        lot['qty'] -= use_from_lot
+        qty_sold_from_lots += use_from_lot
+        if lot['qty'] <= LOT_EPSILON:
+            indices_to_remove.append(i)
+    for index in sorted(indices_to_remove, reverse=True):
+        lots.pop(index)
+    return cost_basis, qty_sold_from_lots
+
+
+def build_case(n_lots, seed):
+    rng = random.Random(seed)
+    lots = [{'qty': float(rng.randint(1, 5)), 'price': float(rng.randint(1, 1000)) * 1000} for _ in range(n_lots)]
+    total = sum(lot['qty'] for lot in lots)
+    sells = []
+    sold = 0
+    while sold < total:
+        qty = float(rng.randint(1, 7))
+        sells.append(qty)
+        sold += qty
+    return lots, sells
+
+
+def run(consume, lots, sells):
+    start = time.perf_counter()
+    costs = [consume(lots, qty)[0] for qty in sells]
+    return time.perf_counter() - start, costs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--lots', type=int, default=100_000)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    lots, sells = build_case(args.lots, args.seed)
+    legacy_time, legacy_costs = run(legacy_consume_lots, [dict(lot) for lot in lots], sells)
+    deque_time, deque_costs = run(_consume_lots, deque(dict(lot) for lot in lots), sells)
+
+    assert legacy_costs == deque_costs, "deque matching diverged from the legacy results"
+    print(f"lots={args.lots} sells={len(sells)}")
+    print(f"legacy list : {legacy_time:.3f}s")
+    print(f"deque       : {deque_time:.3f}s")
+    print(f"speedup     : {legacy_time / deque_time:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+# benchmarks/bench_name_lookup.py
+"""
+Benchmark case-insensitive name lookups with and without the Upper() indexes.
+
+Builds a throwaway test database with --aliases Alias rows (and a matching
+Item each), then times the raw `__iexact` lookups the item resolver replaces
+(alias short name, alias full name, item name) with the functional indexes
+dropped and again with them in place. Prints the query plans too. The
+indexes only pay off on PostgreSQL, where __iexact compiles to
+UPPER(column) = UPPER(%s); SQLite uses LIKE and ignores them. Run from the
+project root:
+
+    python benchmarks/bench_name_lookup.py --aliases 50000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'trade_tracker.settings')
+
+import django
+django.setup()
+
+from django.db import connection
+from django.test.runner import DiscoverRunner
+from django.test.utils import setup_test_environment
+
+from trades.models import Alias, Item
+
+
+def populate(n_aliases):
+    Item.objects.bulk_create(
+        [Item(name=f"Synthetic item {n:06d}") for n in range(n_aliases)], batch_size=5000
+    )
+    Alias.objects.bulk_create(
+        [Alias(full_name=f"Synthetic item {n:06d}", short_name=f"si{n:06d}") for n in range(n_aliases)],
+        batch_size=5000,
+    )
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('ANALYZE trades_alias')
+            cursor.execute('ANALYZE trades_item')
+        elif connection.vendor == 'sqlite':
+            cursor.execute('ANALYZE')
+
+
+def lookups():
+    """The three iexact queries a search used to run, mixed-case input."""
+    return [
+        ('alias.short_name', lambda n: Alias.objects.filter(short_name__iexact=f"SI{n:06d}").first()),
+        ('alias.full_name', lambda n: Alias.objects.filter(full_name__iexact=f"SYNTHETIC ITEM {n:06d}").first()),
+        ('item.name', lambda n: Item.objects.filter(name__iexact=f"synthetic ITEM {n:06d}").first()),
+    ]
+
+
+def time_lookups(names):
+    results = {}
+    for label, lookup in lookups():
+        runs = []
+        for n in names:
+            start = time.perf_counter()
+            assert lookup(n) is not None
+            runs.append(time.perf_counter() - start)
+        results[label] = statistics.median(runs) * 1000
+    return results
+
+
+def show_plan(label):
+    plan = Alias.objects.filter(short_name__iexact='SI000001').explain()
+    print(f"  plan ({label}): {' | '.join(line.strip() for line in plan.splitlines())}")
+
+
+def upper_indexes():
+    return [(Alias, index) for index in Alias._meta.indexes] + [(Item, index) for index in Item._meta.indexes]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--aliases', type=int, default=50_000)
+    parser.add_argument('--lookups', type=int, default=200, help='Lookups timed per query type.')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    setup_test_environment()
+    runner = DiscoverRunner(verbosity=0)
+    old_config = runner.setup_databases()
+    try:
+        populate(args.aliases)
+        names = [rng.randrange(args.aliases) for _ in range(args.lookups)]
+        print(f"{connection.vendor}: {args.aliases} aliases, {args.lookups} lookups per query (median ms)")
+
+        with connection.schema_editor() as editor:
+            for model, index in upper_indexes():
+                editor.remove_index(model, index)
+        show_plan('no index')
+        before = time_lookups(names)
+
+        with connection.schema_editor() as editor:
+            for model, index in upper_indexes():
+                editor.add_index(model, index)
+        show_plan('Upper() index')
+        after = time_lookups(names)
+    finally:
+        runner.teardown_databases(old_config)
+
+    print(f"{'lookup':20} {'no index':>10} {'indexed':>10} {'speedup':>8}")
+    for label in before:
+        print(f"{label:20} {before[label]:>10.3f} {after[label]:>10.3f} {before[label] / after[label]:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -65,6 +65,19 @@ DATABASES = {
     }
 }
 
+# Shared by the web workers and the process_fifo_jobs worker, which publish
+# version tokens here (item resolver maps, chart data versions), so it has to
+# be a backend every process sees. The table is created by the trades
+# migrations (or `python manage.py createcachetable`). Evicted tokens are just
+# regenerated, which only costs a reload/redraw.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'trades_cache',
+        'OPTIONS': {'MAX_ENTRIES': 20000},
+    }
+}
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -92,6 +105,25 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
 LOGIN_URL = 'trades:login_view'
 
+# Queue FIFO profit recomputes after edits/deletes instead of running them in
+# the request. Only turn this on where `python manage.py process_fifo_jobs` is
+# running alongside the site, otherwise profits stop updating after edits.
+FIFO_BACKGROUND_RECOMPUTE = False
+
+# Keep Transaction.cumulative_profit up to date on every write. When False only
+# realised_profit is written and cumulative profit is derived with a SQL window
+# function at read time. Run `python manage.py recompute_fifo` after switching
+# this back on so the stored column is filled in again.
+FIFO_STORE_CUMULATIVE_PROFIT = True
+
+# Upper bound (bytes) on the rendered charts (PNG/JSON) each worker keeps in memory;
+# least recently used images are dropped first. See trades/chart_cache.py.
+CHART_CACHE_MAX_BYTES = 32 * 1024 * 1024
+
+# Most points a chart line is drawn with (PNG and JSON); longer series, e.g.
+# years of daily history, are downsampled with LTTB. See trades/charts.py.
+CHART_MAX_POINTS = 1000
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
@@ -0,0 +1,154 @@
+# trades/chart_cache.py
+# Rendered charts (PNGs and their JSON series), cached per process and keyed
+# by the version of the data they were drawn from, with ETag/Last-Modified
+# so browsers revalidate instead of downloading them again.
+import hashlib
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction as db_transaction
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+DEFAULT_MAX_BYTES = 32 * 1024 * 1024
+
+
+def _version_key(scope, ident):
+    return f'trades:chart_version:{scope}:{ident}'
+
+
+def chart_data_version(scope, ident):
+    """
+    (timestamp, token) of the last change to the data behind a chart: scope
+    'user' (a user's transactions and profits), 'item' (an item's
+    transactions, all users) or 'wealth' (an account's WealthData). Kept in
+    the default cache, which settings.CACHES points at the database so every
+    web worker sees the same version, including the bumps made by the
+    process_fifo_jobs worker when it rewrites profits. With a per-process
+    cache (LocMemCache) those bumps would never reach the web workers.
+    """
+    key = _version_key(scope, ident)
+    version = cache.get(key)
+    if version is None:
+        version = (time.time(), uuid.uuid4().hex)
+        if not cache.add(key, version, timeout=None):
+            version = cache.get(key, version)
+    return version
+
+
+class _PendingBumps:
+    """The (scope, ident) pairs bumped inside the current transaction, written out once on commit."""
+
+    def __init__(self):
+        self.pairs = set()
+        self.done = False
+
+    def __call__(self):
+        self.done = True
+        for scope, ident in self.pairs:
+            cache.set(_version_key(scope, ident), (time.time(), uuid.uuid4().hex), timeout=None)
+
+
+def bump_chart_data_version(scope, ident):
+    """
+    Mark the data behind `scope`/`ident` as changed, for every process sharing
+    the cache. Inside a transaction the new version is written on commit,
+    once per (scope, ident) however many rows changed, so no chart is drawn
+    from rows read before the change became visible and cached under it.
+    """
+    if ident is None:
+        return
+    connection = db_transaction.get_connection()
+    pending = getattr(connection, 'trades_chart_bumps', None)
+    # Start a new set once the last one was written, or dropped by a rollback
+    if pending is None or pending.done or not any(entry[1] is pending for entry in connection.run_on_commit):
+        pending = _PendingBumps()
+        connection.trades_chart_bumps = pending
+        pending.pairs.add((scope, ident))
+        db_transaction.on_commit(pending)  # Runs straight away outside a transaction
+    else:
+        pending.pairs.add((scope, ident))
+
+
+class ChartCache:
+    """Least-recently-used map of key -> (content type, body), bounded by total body size."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key, content_type, body):
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.size -= len(old[1])
+            self._entries[key] = (content_type, body)
+            self.size += len(body)
+            while self.size > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.size -= len(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+
+rendered_charts = ChartCache(getattr(settings, 'CHART_CACHE_MAX_BYTES', DEFAULT_MAX_BYTES))
+
+
+def cached_chart(dependencies):
+    """
+    Decorator for views that return a chart (PNG or JSON). `dependencies(request)`
+    returns (key_parts, versions): everything besides the data that changes
+    the picture (user, item, timeframe, ...) and the (scope, ident) data
+    versions it is drawn from. A request whose If-None-Match/If-Modified-Since
+    still matches gets a 304 without touching the data; otherwise the chart
+    is served from rendered_charts, or rendered by the view and cached.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            key_parts, scopes = dependencies(request)
+            versions = [chart_data_version(scope, ident) for scope, ident in scopes]
+            etag = hashlib.sha1(repr((view.__name__, key_parts, versions)).encode()).hexdigest()
+            last_modified = int(max((version[0] for version in versions), default=0))
+
+            response = get_conditional_response(request, etag=quote_etag(etag), last_modified=last_modified)
+            if response is None:
+                cached = rendered_charts.get(etag)
+                if cached is not None:
+                    response = HttpResponse(cached[1], content_type=cached[0])
+                else:
+                    response = view(request, *args, **kwargs)
+                    if response.status_code == 200:
+                        rendered_charts.set(etag, response['Content-Type'], response.content)
+
+            if response.status_code in (200, 304):
+                response['ETag'] = quote_etag(etag)
+                response['Last-Modified'] = http_date(last_modified)
+                # Per-user charts: let browsers keep them, but always check back
+                patch_cache_control(response, private=True, no_cache=True)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,268 @@
+# trades/charts.py
+# The bucketed time series behind the charts. Shared by the PNG views
+# (drawn with matplotlib) and the JSON endpoints the pages draw client-side.
+import math
+from datetime import timezone as dt_timezone
+from itertools import islice
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.db.models import ExpressionWrapper, F, FloatField, Q, Sum, Value
+from django.db.models.functions import NullIf, TruncDay, TruncMonth, TruncYear
+
+from .fifo import with_running_profit
+from .models import Transaction, WealthData
+
+MONTHS = ["January", "February", "March", "April", "May", "June",
+          "July", "August", "September", "October", "November", "December"]
+
+RESAMPLE_RULES = {'Monthly': 'MS', 'Yearly': 'YS'}  # Anything else is Daily ('D')
+LABEL_FORMATS = {'Monthly': '%Y-%m', 'Yearly': '%Y'}  # Anything else is '%Y-%m-%d'
+TRUNCATE_FUNCTIONS = {'Monthly': TruncMonth, 'Yearly': TruncYear}  # Anything else is TruncDay
+
+FRAME_CHUNK_SIZE = 2000  # Rows fetched per round trip by queryset_frame()
+DEFAULT_CHART_MAX_POINTS = 1000  # Overridden by settings.CHART_MAX_POINTS
+
+
+def resample_rule(timeframe):
+    return RESAMPLE_RULES.get(timeframe, 'D')
+
+
+def label_format(timeframe):
+    return LABEL_FORMATS.get(timeframe, '%Y-%m-%d')
+
+
+def queryset_frame(queryset, columns, chunk_size=FRAME_CHUNK_SIZE, count=True):
+    """
+    DataFrame of `columns` ({field or annotation name: NumPy dtype}) read from
+    `queryset`. Rows are streamed with values_list().iterator() a chunk at a
+    time straight into arrays preallocated from a COUNT, so no model instance
+    (or list of every row) is built on the way. Datetime columns come back
+    as naive UTC. With count=False (e.g. for a GROUP BY that a COUNT would
+    run twice) the arrays start at one chunk and double as they fill.
+    """
+    names = list(columns)
+    size = queryset.count() if count else chunk_size
+    arrays = [np.empty(size, dtype=dtype) for dtype in columns.values()]
+    rows = queryset.values_list(*names).iterator(chunk_size=chunk_size)
+    filled = 0
+    while chunk := list(islice(rows, chunk_size)):
+        end = filled + len(chunk)
+        if end > size:
+            # Rows added since the count, or no count
+            size = max(end, 2 * size)
+            arrays = [np.concatenate([array, np.empty(size - len(array), dtype=array.dtype)]) for array in arrays]
+        for array, values in zip(arrays, zip(*chunk)):
+            if array.dtype.kind == 'M':
+                values = pd.to_datetime(list(values), utc=True).tz_localize(None).to_numpy()
+            array[filled:end] = values
+        filled = end
+    return pd.DataFrame({name: array[:filled] for name, array in zip(names, arrays)}, copy=False)
+
+
+def global_profit_series(user, timeframe):
+    """
+    The user's cumulative realised profit at the end of each day/month/year,
+    forward-filled so the line has no gaps. None without any history.
+    """
+    queryset = Transaction.objects.filter(user=user).order_by('date_of_holding', 'id')
+    # Running profit is stored or derived in SQL, see trades.fifo
+    df = queryset_frame(with_running_profit(queryset),
+                        {'date_of_holding': 'datetime64[ns]', 'running_profit': 'float64'})
+    if df.empty:
+        return None
+    df.columns = ['date', 'cumulative_profit']
+    df.set_index('date', inplace=True)
+    df = df.resample(resample_rule(timeframe)).last()
+    return df['cumulative_profit'].ffill()
+
+
+def item_price_series(item, timeframe):
+    """
+    Quantity-weighted average Buy and Sell price of `item` (all users) per
+    day/month/year, spread over a daily index and forward-filled. A DataFrame
+    with buy_price and sell_price columns; None without any Buy/Sell trades.
+
+    The buckets and averages are computed in the database, so only one row
+    per bucket comes back however many trades the item has.
+    """
+    bucket = TRUNCATE_FUNCTIONS.get(timeframe, TruncDay)('date_of_holding', tzinfo=dt_timezone.utc)
+    buckets = (
+        Transaction.objects.filter(item=item, trans_type__in=[Transaction.BUY, Transaction.SELL])
+        .annotate(bucket=bucket)
+        .values('bucket')
+        .annotate(
+            buy_price=_weighted_price(Transaction.BUY),
+            sell_price=_weighted_price(Transaction.SELL),
+        )
+        .order_by('bucket')
+    )
+    merged = queryset_frame(buckets, {'bucket': 'datetime64[ns]', 'buy_price': 'float64', 'sell_price': 'float64'},
+                            count=False)
+    if merged.empty:
+        return None
+
+    merged.rename(columns={'bucket': 'date'}, inplace=True)
+    merged.set_index('date', inplace=True)
+    # Missing sides come back as NULL (NaN); a zero average is treated as missing to avoid zero dips
+    merged = merged.replace(0, float('nan'))
+
+    # Resample daily so lines remain continuous; forward-fill missing values
+    merged = merged.resample('D').asfreq()
+    merged['buy_price'] = merged['buy_price'].ffill()
+    merged['sell_price'] = merged['sell_price'].ffill()
+    return merged[['buy_price', 'sell_price']]
+
+
+def _weighted_price(trans_type):
+    """Sum(price * quantity) / Sum(quantity) over the rows of one type (NULL if there are none)."""
+    only = Q(trans_type=trans_type)
+    return ExpressionWrapper(
+        Sum(F('price') * F('quantity'), filter=only) / NullIf(Sum('quantity', filter=only), Value(0.0)),
+        output_field=FloatField(),
+    )
+
+
+def item_profit_series(user, item, timeframe):
+    """
+    The user's cumulative realised profit on `item`, summed per
+    day/month/year (every day for Daily, only the months/years with trades
+    otherwise). None without any history.
+    """
+    qs = Transaction.objects.filter(user=user, item=item).order_by('date_of_holding', 'id')
+    df = queryset_frame(qs, {'date_of_holding': 'datetime64[ns]', 'realised_profit': 'float64'})
+    if df.empty:
+        return None
+    profit = df.set_index('date_of_holding')['realised_profit']
+    if timeframe in RESAMPLE_RULES:
+        # Empty months/years sum to NaN with min_count and are left out
+        buckets = profit.resample(resample_rule(timeframe)).sum(min_count=1).dropna()
+    else:
+        # Days without trades add 0, so the running total carries over them
+        buckets = profit.resample('D').sum()
+    cumulative = buckets.cumsum()
+    cumulative.index.name = 'date'
+    return cumulative.rename('cumulative_profit')
+
+
+WEALTH_COLUMNS = {'year': 'int64', **{month.lower(): object for month in MONTHS}}
+
+
+def _wealth_number(text):
+    """A month's wealth figure as a number (blank or unreadable counts as 0)."""
+    try:
+        return float((text or "0").replace(',', '').strip())
+    except ValueError:
+        return 0
+
+
+def _wealth_frame(queryset):
+    """Year and the twelve monthly figures (as numbers, columns 1-12) of some WealthData rows."""
+    frame = queryset_frame(queryset, WEALTH_COLUMNS)
+    numbers = pd.DataFrame(
+        {i: frame[month.lower()].map(_wealth_number).astype('float64') for i, month in enumerate(MONTHS, start=1)},
+        index=frame.index,
+    )
+    numbers.insert(0, 'year', frame['year'])
+    return numbers
+
+
+def wealth_year_totals(username, year):
+    """Total wealth of `username`'s accounts for each month of `year` (12 numbers)."""
+    numbers = _wealth_frame(WealthData.objects.filter(account_name=username, year=year))
+    return [float(numbers[i].sum()) for i in range(1, 13)]
+
+
+def wealth_all_years_series(username):
+    """
+    Total wealth of `username`'s accounts per month across every year, indexed
+    by the first of the month. Months that add up to zero are left out.
+    """
+    numbers = _wealth_frame(WealthData.objects.filter(account_name=username))
+    if numbers.empty:
+        return pd.Series(dtype='float64')
+    by_month = numbers.groupby('year').sum().stack()
+    index = pd.to_datetime(pd.DataFrame({
+        'year': by_month.index.get_level_values(0),
+        'month': by_month.index.get_level_values(1),
+        'day': 1,
+    }))
+    series = pd.Series(by_month.to_numpy(dtype='float64'), index=pd.DatetimeIndex(index)).sort_index()
+    return series[series != 0]
+
+
+def chart_max_points():
+    return getattr(settings, 'CHART_MAX_POINTS', DEFAULT_CHART_MAX_POINTS)
+
+
+def lttb_indices(x, y, threshold):
+    """
+    Positions of the `threshold` points of (x, y) that Largest-Triangle-Three-
+    Buckets keeps: the first and last point, and from each of threshold - 2
+    equal buckets in between the point making the largest triangle with the
+    point kept before it and the average of the next bucket. Peaks and
+    troughs survive because they make the largest triangles.
+    """
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    edges = (np.arange(threshold - 1) * (n - 2) / (threshold - 2)).astype(np.intp) + 1
+    keep = np.empty(threshold, dtype=np.intp)
+    keep[0], keep[-1] = 0, n - 1
+    previous = 0
+    for bucket in range(threshold - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        next_end = edges[bucket + 2] if bucket + 2 < len(edges) else n
+        next_x, next_y = x[end:next_end].mean(), y[end:next_end].mean()
+        px, py = x[previous], y[previous]
+        areas = np.abs((px - next_x) * (y[start:end] - py) - (px - x[start:end]) * (next_y - py))
+        previous = start + int(np.argmax(areas))
+        keep[bucket + 1] = previous
+    return keep
+
+
+def downsample(data, max_points=None):
+    """
+    `data` (a Series, or a DataFrame of lines sharing a DatetimeIndex) cut
+    down with LTTB to at most `max_points` (default: chart_max_points())
+    rows. Each line of a DataFrame picks its share of the budget from its
+    non-missing values and every row any line picked is kept. Returned
+    unchanged when already short enough.
+    """
+    max_points = max_points or chart_max_points()
+    if len(data) <= max_points:
+        return data
+    x = data.index.asi8 / 1e9 if isinstance(data.index, pd.DatetimeIndex) else np.arange(len(data), dtype='float64')
+    lines = [data] if isinstance(data, pd.Series) else [data[column] for column in data.columns]
+    keep = []
+    for line in lines:
+        values = line.to_numpy(dtype='float64', na_value=np.nan)
+        present = np.flatnonzero(~np.isnan(values))
+        keep.append(present[lttb_indices(x[present], values[present], max_points // len(lines))])
+    return data.iloc[np.unique(np.concatenate(keep))]
+
+
+def chart_payload(title, index=None, lines=(), message=None):
+    """
+    JSON-ready chart: x as Unix timestamps (seconds) and one entry per line,
+    (label, color, values) with missing values as None. `message` replaces
+    the chart when there is nothing to draw.
+    """
+    index = pd.DatetimeIndex(index if index is not None else [])
+    if index.tz is not None:
+        index = index.tz_convert('UTC').tz_localize(None)
+    return {
+        'title': title,
+        'message': message,
+        'x': [int(ts.timestamp()) for ts in index],
+        'series': [
+            {
+                'label': label,
+                'color': color,
+                'values': [None if v is None or v is pd.NA or (isinstance(v, float) and math.isnan(v)) else float(v)
+                           for v in values],
+            }
+            for label, color, values in lines
+        ],
+    }
@@ -0,0 +1,531 @@
+# trades/fifo.py
+# FIFO realised/cumulative profit engine (moved out of views.py)
+from collections import deque
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction as db_transaction
+from django.db.models import Avg, Count, F, Max, OuterRef, Q, Subquery, Sum, Value, Window
+from django.db.models.functions import Coalesce
+
+from .models import Transaction, OpenLot, FifoRecomputeJob, Position
+from .chart_cache import bump_chart_data_version
+
+BUY_TYPES = [Transaction.BUY, Transaction.INSTANT_BUY]
+SELL_TYPES = [Transaction.SELL, Transaction.INSTANT_SELL]
+PLACING_TYPES = [Transaction.PLACING_BUY, Transaction.PLACING_SELL]
+
+SELL_FEE_RATE = 0.02   # 2% fee taken from every sale
+LOT_EPSILON = 0.0001   # Lots with less than this left are treated as used up
+BULK_UPDATE_BATCH_SIZE = 500  # Rows per UPDATE statement when writing results back
+
+
+def store_cumulative_profit():
+    """
+    True when cumulative_profit is kept up to date in the table (the default).
+    With settings.FIFO_STORE_CUMULATIVE_PROFIT = False the engine only writes
+    realised_profit and readers derive the running total with a window function.
+    """
+    return getattr(settings, 'FIFO_STORE_CUMULATIVE_PROFIT', True)
+
+
+def _consume_lots(lots, quantity):
+    """
+    Take `quantity` from the front of `lots` (a deque, oldest first), dropping
+    lots that are used up. Returns (cost_basis, quantity_matched).
+
+    Used-up lots sit at the head of the queue, so they are normally removed with
+    popleft() and a sell costs O(lots it touches) rather than O(all lots).
+    """
+    cost_basis = 0.0
+    indices_to_remove = []
+    qty_sold_from_lots = 0
+
+    i = 0
+    while i < len(lots) and qty_sold_from_lots < quantity:
+        lot = lots[i]
+        use_from_lot = min(quantity - qty_sold_from_lots, lot['qty'])
+        cost_basis += use_from_lot * lot['price']
+        lot['qty'] -= use_from_lot
+        qty_sold_from_lots += use_from_lot
+        if lot['qty'] <= LOT_EPSILON:
+            indices_to_remove.append(i)
+        i += 1
+
+    if indices_to_remove and indices_to_remove[-1] == len(indices_to_remove) - 1:
+        # The usual case: the used-up lots are exactly the first few
+        for _ in indices_to_remove:
+            lots.popleft()
+    else:
+        # Float rounding left a partly used lot ahead of a used-up one
+        for index in reversed(indices_to_remove):
+            del lots[index]
+
+    return cost_basis, qty_sold_from_lots
+
+
+def _sell_profit(trans_id, price, quantity, cost_basis, qty_sold_from_lots):
+    # --- Calculate profit (2% fee on the sale value) ---
+    sale_value = price * quantity
+    fee = sale_value * SELL_FEE_RATE
+    net_sale_value = sale_value - fee
+
+    if abs(qty_sold_from_lots - quantity) > LOT_EPSILON:
+        print(f"FIFO Warning: Sold {quantity} but only matched {qty_sold_from_lots} from lots for Tx ID {trans_id}. Calculated profit based on matched lots.")
+
+    return net_sale_value - cost_basis
+
+
+def _replay_transaction(purchase_lots, trans_id, item_id, trans_type, price, quantity, date_of_holding):
+    """
+    Apply a single transaction to the in-memory lot queues and return the
+    realised profit it produces (0.0 for buys and unknown types).
+    """
+    if item_id not in purchase_lots:
+        purchase_lots[item_id] = deque()
+
+    if trans_type in BUY_TYPES:
+        # A lot with nothing in it can never be matched, so it isn't queued
+        if quantity > 0:
+            purchase_lots[item_id].append({
+                'qty': quantity, 'price': price, 'trans_id': trans_id, 'date': date_of_holding,
+            })
+        return 0.0
+
+    if trans_type not in SELL_TYPES:
+        return 0.0
+
+    cost_basis, qty_sold_from_lots = _consume_lots(purchase_lots[item_id], quantity)
+    return _sell_profit(trans_id, price, quantity, cost_basis, qty_sold_from_lots)
+
+
+def _sync_open_lots(user, purchase_lots, item_ids=None):
+    """
+    Replace the user's OpenLot rows with the lots left after a replay, either
+    for every item or only for `item_ids`.
+    """
+    stale_lots = OpenLot.objects.filter(user=user)
+    if item_ids is not None:
+        stale_lots = stale_lots.filter(item_id__in=item_ids)
+    stale_lots.delete()
+    OpenLot.objects.bulk_create([
+        OpenLot(
+            user=user, item_id=item_id, source_transaction_id=lot['trans_id'],
+            quantity=lot['qty'], price=lot['price'], date_of_holding=lot['date'],
+        )
+        for item_id, lots in purchase_lots.items()
+        for lot in lots
+    ], batch_size=1000)
+
+
+def _position_aggregates():
+    # Per-item totals over a user's non-placing history, as stored on Position
+    is_buy = Q(trans_type__in=BUY_TYPES)
+    is_sell = Q(trans_type__in=SELL_TYPES)
+    return {
+        'bought': Sum('quantity', filter=is_buy, default=0.0),
+        'sold': Sum('quantity', filter=is_sell, default=0.0),
+        'sell_count': Count('id', filter=is_sell),
+        'avg_sold_price': Avg('price', filter=is_sell, default=0.0),
+        'realised': Sum('realised_profit', default=0.0),
+        'last_trade_at': Max('date_of_holding'),
+    }
+
+
+def refresh_positions(user, item_ids=None):
+    """
+    Rebuild `user`'s Position rows from their history, for every item or only
+    `item_ids`, in one grouped query plus one upsert. Items with no history
+    left lose their row.
+    """
+    history = Transaction.objects.filter(user=user).exclude(trans_type__in=PLACING_TYPES)
+    stale = Position.objects.filter(user=user)
+    if item_ids is not None:
+        history = history.filter(item_id__in=item_ids)
+        stale = stale.filter(item_id__in=item_ids)
+
+    rows = history.order_by().values('item_id').annotate(**_position_aggregates())
+    positions = [
+        Position(
+            user=user, item_id=row['item_id'],
+            total_bought=row['bought'], total_sold=row['sold'],
+            remaining_quantity=row['bought'] - row['sold'],
+            sell_count=row['sell_count'], average_sold_price=row['avg_sold_price'],
+            realised_profit=row['realised'], last_trade_at=row['last_trade_at'],
+        )
+        for row in rows
+    ]
+    stale.exclude(item_id__in=[position.item_id for position in positions]).delete()
+    Position.objects.bulk_create(
+        positions, batch_size=1000, update_conflicts=True, unique_fields=['user', 'item'],
+        update_fields=[
+            'total_bought', 'total_sold', 'remaining_quantity', 'sell_count',
+            'average_sold_price', 'realised_profit', 'last_trade_at',
+        ],
+    )
+    # Profits were rewritten with bulk_update, which sends no signals: redraw the user's charts
+    bump_chart_data_version('user', user.id)
+
+
+def _add_to_position(trans):
+    """
+    Fold a transaction that was just added at the end of the history into
+    its Position row with a single UPDATE (the row is built from the history
+    if it doesn't exist yet).
+    """
+    changes = {
+        'realised_profit': F('realised_profit') + trans.realised_profit,
+        'last_trade_at': trans.date_of_holding,
+    }
+    if trans.trans_type in BUY_TYPES:
+        changes['total_bought'] = F('total_bought') + trans.quantity
+        changes['remaining_quantity'] = F('remaining_quantity') + trans.quantity
+    elif trans.trans_type in SELL_TYPES:
+        changes['total_sold'] = F('total_sold') + trans.quantity
+        changes['remaining_quantity'] = F('remaining_quantity') - trans.quantity
+        # Every right-hand side sees the old values, so this is the running mean
+        changes['average_sold_price'] = (
+            (F('average_sold_price') * F('sell_count') + trans.price) / (F('sell_count') + 1.0)
+        )
+        changes['sell_count'] = F('sell_count') + 1
+    updated = Position.objects.filter(user=trans.user, item_id=trans.item_id).update(**changes)
+    if not updated:
+        refresh_positions(trans.user, [trans.item_id])
+
+
+def calculate_fifo_for_user(user, since=None, items=None):
+    """
+    Recalculate realised and cumulative profit for every non-placing
+    transaction of `user`, oldest first.
+
+    If `since` (a datetime) is given, only transactions dated at or after it
+    are rewritten. Pass the `date_of_holding` of the transaction that was
+    added, edited or deleted.
+
+    If `items` (item ids) is given, only those items' lots are re-matched.
+    Lot matching is independent per item, so the other items keep their
+    stored realised profit and only take part in the cumulative pass (or are
+    not read at all when cumulative_profit isn't stored).
+
+    The lot queues as they stood just before `since` are restored by replaying
+    the in-scope items' earlier history in memory (no writes), and the running
+    total is picked up from the last earlier row's stored cumulative_profit.
+    cumulative_profit is then rebuilt with a single ordered prefix-sum pass
+    over the realised profits from `since` onwards, so the result is
+    identical to a full replay.
+
+    Results are written back in batched bulk_update() statements, skipping
+    rows whose realised/cumulative profit did not change. When
+    store_cumulative_profit() is off only realised_profit is compared and
+    written, so an edit touches just the rows whose profit actually moved.
+    The OpenLot and Position rows of the replayed items are refreshed too.
+    """
+    User = get_user_model()
+    if not user or not isinstance(user, User):
+        print(f"FIFO Calc: Invalid user object received: {user}")
+        return
+
+    item_ids = set(items) if items is not None else None
+    store_cumulative = store_cumulative_profit()
+    update_fields = ['realised_profit', 'cumulative_profit'] if store_cumulative else ['realised_profit']
+
+    with db_transaction.atomic():
+        purchase_lots = {}
+        cumulative_sum = 0.0
+        user_trans = Transaction.objects.filter(
+            user=user
+        ).exclude(
+            trans_type__in=PLACING_TYPES
+        ).order_by('date_of_holding', 'id')
+        placing_trans = Transaction.objects.filter(user=user, trans_type__in=PLACING_TYPES)
+
+        if since is not None:
+            earlier_trans = user_trans.filter(date_of_holding__lt=since)
+
+            # Restore the in-scope lot queues as they were just before `since`
+            prefix_trans = earlier_trans
+            if item_ids is not None:
+                prefix_trans = prefix_trans.filter(item_id__in=item_ids)
+            prefix_rows = prefix_trans.values_list(
+                'id', 'item_id', 'trans_type', 'price', 'quantity', 'date_of_holding'
+            )
+            for row in prefix_rows.iterator():
+                _replay_transaction(purchase_lots, *row)
+
+            last_cumulative = None
+            if store_cumulative:
+                last_cumulative = earlier_trans.order_by('-date_of_holding', '-id').values_list(
+                    'cumulative_profit', flat=True
+                ).first()
+            if last_cumulative is not None:
+                cumulative_sum = last_cumulative
+
+            user_trans = user_trans.filter(date_of_holding__gte=since)
+            placing_trans = placing_trans.filter(date_of_holding__gte=since)
+
+        # Placing orders never carry profit
+        placing_trans.exclude(realised_profit=0.0, cumulative_profit=0.0).update(
+            realised_profit=0.0, cumulative_profit=0.0
+        )
+
+        if not store_cumulative and item_ids is not None:
+            # Without a stored running total the other items' rows are never touched
+            user_trans = user_trans.filter(item_id__in=item_ids)
+
+        changed = []
+        replay_rows = user_trans.values_list(
+            'id', 'item_id', 'trans_type', 'price', 'quantity', 'date_of_holding',
+            'realised_profit', 'cumulative_profit'
+        )
+        for trans_id, item_id, trans_type, price, quantity, date_of_holding, old_realised, old_cumulative in replay_rows.iterator():
+            if item_ids is None or item_id in item_ids:
+                profit = _replay_transaction(purchase_lots, trans_id, item_id, trans_type, price, quantity, date_of_holding)
+            else:
+                profit = old_realised
+            cumulative_sum += profit
+
+            # Only rows whose values actually moved are written back
+            if profit != old_realised or (store_cumulative and cumulative_sum != old_cumulative):
+                changed.append(Transaction(id=trans_id, realised_profit=profit, cumulative_profit=cumulative_sum))
+
+        Transaction.objects.bulk_update(changed, update_fields, batch_size=BULK_UPDATE_BATCH_SIZE)
+
+        _sync_open_lots(user, purchase_lots, item_ids)
+        refresh_positions(user, item_ids)
+
+
+def apply_new_transaction(trans):
+    """
+    Fast path for a transaction that was just added at the end of its owner's
+    history: a buy opens a lot, a sell consumes the item's lots straight from
+    the OpenLot ledger. Nothing else is read. If the transaction turns out not
+    to be the latest one (or a queued replay is pending), falls back to an
+    incremental replay of its item from its date.
+    """
+    user = trans.user
+    if user is None or trans.trans_type in PLACING_TYPES:
+        return
+
+    with db_transaction.atomic():
+        # Stored profits/lots can't be trusted while a queued replay is outstanding
+        if fifo_update_pending(user):
+            request_fifo_recompute(user, since=trans.date_of_holding, items=[trans.item_id])
+            return
+
+        user_trans = Transaction.objects.filter(user=user).exclude(trans_type__in=PLACING_TYPES)
+        later_exists = user_trans.filter(
+            Q(date_of_holding__gt=trans.date_of_holding) |
+            Q(date_of_holding=trans.date_of_holding, id__gt=trans.id)
+        ).exists()
+        if later_exists:
+            request_fifo_recompute(user, since=trans.date_of_holding, items=[trans.item_id])
+            return
+
+        cumulative_sum = None
+        if store_cumulative_profit():
+            cumulative_sum = user_trans.filter(
+                Q(date_of_holding__lt=trans.date_of_holding) |
+                Q(date_of_holding=trans.date_of_holding, id__lt=trans.id)
+            ).order_by('-date_of_holding', '-id').values_list('cumulative_profit', flat=True).first()
+        if cumulative_sum is None:
+            cumulative_sum = 0.0
+
+        trans.realised_profit = 0.0
+        if trans.trans_type in BUY_TYPES:
+            if trans.quantity > 0:
+                OpenLot.objects.create(
+                    user=user, item_id=trans.item_id, source_transaction=trans,
+                    quantity=trans.quantity, price=trans.price, date_of_holding=trans.date_of_holding,
+                )
+        elif trans.trans_type in SELL_TYPES:
+            ledger = list(
+                OpenLot.objects.select_for_update()
+                .filter(user=user, item_id=trans.item_id)
+                .order_by('date_of_holding', 'source_transaction_id')
+            )
+            lots = deque({'qty': lot.quantity, 'price': lot.price, 'lot': lot} for lot in ledger)
+            cost_basis, qty_sold_from_lots = _consume_lots(lots, trans.quantity)
+
+            remaining = {lot['lot'].id: lot['qty'] for lot in lots}
+            OpenLot.objects.filter(id__in=[lot.id for lot in ledger if lot.id not in remaining]).delete()
+            for lot in ledger:
+                if lot.id in remaining and remaining[lot.id] != lot.quantity:
+                    lot.quantity = remaining[lot.id]
+                    lot.save(update_fields=['quantity'])
+
+            trans.realised_profit = _sell_profit(
+                trans.id, trans.price, trans.quantity, cost_basis, qty_sold_from_lots
+            )
+            cumulative_sum += trans.realised_profit
+
+        if store_cumulative_profit():
+            trans.cumulative_profit = cumulative_sum
+            trans.save(update_fields=['realised_profit', 'cumulative_profit'])
+        else:
+            trans.save(update_fields=['realised_profit'])
+        _add_to_position(trans)
+        # The profit-only save above doesn't bump the user's charts (trades.signals)
+        bump_chart_data_version('user', user.id)
+
+
+def request_fifo_recompute(user, since=None, items=None):
+    """
+    Recompute `user`'s profits from `since` onwards (for `items` only, if
+    given): inline by default, or as queued FifoRecomputeJob rows when
+    settings.FIFO_BACKGROUND_RECOMPUTE is on.
+    """
+    if not getattr(settings, 'FIFO_BACKGROUND_RECOMPUTE', False):
+        calculate_fifo_for_user(user, since=since, items=items)
+        return
+    # Quantities can be brought up to date now; profits follow with the job
+    refresh_positions(user, items)
+    if items is None:
+        FifoRecomputeJob.objects.create(user=user, since=since)
+    else:
+        FifoRecomputeJob.objects.bulk_create([
+            FifoRecomputeJob(user=user, since=since, item_id=item_id) for item_id in set(items)
+        ])
+
+
+def fifo_update_pending(user):
+    """True while `user` has queued recomputes that haven't been processed yet."""
+    return FifoRecomputeJob.objects.filter(user=user).exists()
+
+
+def process_fifo_jobs():
+    """
+    Run every queued recompute, one replay per user: a burst of jobs for the
+    same user is coalesced into a single replay from the earliest `since`,
+    covering the union of their items (all items if any job has none).
+    Returns the number of users recomputed.
+    """
+    User = get_user_model()
+    processed = 0
+    user_ids = FifoRecomputeJob.objects.values_list('user_id', flat=True).distinct()
+    for user_id in list(user_ids):
+        with db_transaction.atomic():
+            # One replay per user at a time: while another worker holds this user's
+            # row, jobs queued meanwhile wait for a later pass instead of replaying
+            # against lots and profits that are being rewritten
+            user = User.objects.select_for_update(skip_locked=True).filter(id=user_id).first()
+            if user is None:
+                continue
+            # skip_locked lets several workers share the queue without blocking each other
+            jobs = list(
+                FifoRecomputeJob.objects.select_for_update(skip_locked=True)
+                .filter(user_id=user_id)
+                .values_list('id', 'since', 'item_id')
+            )
+            if not jobs:
+                continue
+            since_values = [since for _, since, _ in jobs]
+            since = None if None in since_values else min(since_values)
+            item_values = [item_id for _, _, item_id in jobs]
+            items = None if None in item_values else set(item_values)
+
+            calculate_fifo_for_user(user, since=since, items=items)
+            # Jobs queued while this replay ran stay behind for the next pass
+            FifoRecomputeJob.objects.filter(id__in=[job_id for job_id, _, _ in jobs]).delete()
+        processed += 1
+    return processed
+
+
+def open_positions(user):
+    """
+    What `user` is holding right now, read from the OpenLot ledger.
+    Returns a list of dicts with item_id, item_name, quantity and average cost.
+    """
+    rows = (
+        OpenLot.objects.filter(user=user)
+        .values('item_id', 'item__name')
+        .annotate(total_quantity=Sum('quantity'), total_cost=Sum(F('quantity') * F('price')))
+        .order_by('item__name')
+    )
+    return [
+        {
+            'item_id': row['item_id'],
+            'item_name': row['item__name'],
+            'quantity': row['total_quantity'],
+            'average_cost': row['total_cost'] / row['total_quantity'] if row['total_quantity'] else 0,
+        }
+        for row in rows
+    ]
+
+
+def running_profit_window():
+    """
+    Window expression for a user's running realised profit in history order,
+    i.e. cumulative_profit computed at read time. The window only sees the
+    rows its queryset selects, so use it on a user's complete history.
+    """
+    return Window(
+        expression=Sum('realised_profit'),
+        partition_by=[F('user_id')],
+        order_by=[F('date_of_holding').asc(), F('id').asc()],
+    )
+
+
+def with_running_profit(queryset, complete_history=True):
+    """
+    Annotate `running_profit` (the cumulative realised profit at each row) on
+    a Transaction queryset.
+
+    Reads the stored cumulative_profit column while store_cumulative_profit()
+    is on. Otherwise it is derived in SQL: with the window function when
+    `queryset` is a user's complete history (e.g. the profit chart), or with a
+    correlated per-row sum for tables that are filtered or paged, where a
+    window would only add up the rows that survived the filter.
+    """
+    if store_cumulative_profit():
+        return queryset.annotate(running_profit=F('cumulative_profit'))
+    if complete_history:
+        return queryset.annotate(running_profit=running_profit_window())
+
+    profit_to_date = (
+        Transaction.objects.filter(user_id=OuterRef('user_id'))
+        .filter(
+            Q(date_of_holding__lt=OuterRef('date_of_holding')) |
+            Q(date_of_holding=OuterRef('date_of_holding'), id__lte=OuterRef('id'))
+        )
+        .order_by()
+        .values('user_id')
+        .annotate(total=Sum('realised_profit'))
+        .values('total')
+    )
+    return queryset.annotate(running_profit=Coalesce(Subquery(profit_to_date), Value(0.0)))
+
+
+def global_realised_profit(user):
+    """Highest cumulative realised profit `user` has reached (0 with no history)."""
+    user_trans = Transaction.objects.filter(user=user)
+    if store_cumulative_profit():
+        total = user_trans.aggregate(total=Max('cumulative_profit'))['total']
+    else:
+        total = with_running_profit(user_trans).aggregate(total=Max('running_profit'))['total']
+    return total or 0
+
+
+FIFO_ENGINES = ['loop', 'numpy']
+
+
+def get_fifo_engine(name='loop'):
+    """
+    Return the full-replay function for `name`: 'loop' (calculate_fifo_for_user)
+    or 'numpy' (the vectorised engine in trades.fifo_numpy).
+    """
+    if name == 'loop':
+        return calculate_fifo_for_user
+    if name == 'numpy':
+        from .fifo_numpy import calculate_fifo_numpy
+        return calculate_fifo_numpy
+    raise ValueError(f"Unknown FIFO engine '{name}' (expected one of {', '.join(FIFO_ENGINES)})")
+
+
+def calculate_fifo_for_all_users(engine='loop'):
+    recalc = get_fifo_engine(engine)
+    User = get_user_model()
+    all_users = User.objects.filter(transaction__isnull=False).distinct()
+    for u in all_users:
+        print(f"Calculating FIFO for user: {u.username}") # Add logging
+        recalc(u)
+    print("Finished FIFO calculation for all users.")
@@ -0,0 +1,155 @@
+# trades/fifo_numpy.py
+# Vectorised FIFO engine for batch recomputation (all users / legacy import)
+import numpy as np
+from django.contrib.auth import get_user_model
+from django.db import transaction as db_transaction
+
+from .models import Transaction
+from .fifo import (
+    BUY_TYPES, SELL_TYPES, PLACING_TYPES, SELL_FEE_RATE, LOT_EPSILON,
+    BULK_UPDATE_BATCH_SIZE, _replay_transaction, _sync_open_lots, refresh_positions, store_cumulative_profit,
+)
+
+
+def _cost_of_first_units(units, cum_qty, cum_value, prices):
+    """
+    Cost of the first `units` bought (vectorised over `units`), where the buys
+    are described by their running quantity/value totals.
+    """
+    if len(prices) == 0:
+        return np.zeros_like(units)
+    lot = np.searchsorted(cum_qty, units, side='left')
+    lot = np.minimum(lot, len(prices) - 1)
+    qty_before = np.concatenate(([0.0], cum_qty[:-1]))[lot]
+    value_before = np.concatenate(([0.0], cum_value[:-1]))[lot]
+    return value_before + (units - qty_before) * prices[lot]
+
+
+def _match_item(positions, is_buy, is_sell, prices, quantities, realised):
+    """
+    FIFO-match one item's buys and sells (given as row positions in the user's
+    ordered history) and write each sell's profit into `realised`.
+    Returns the open lots as (position, remaining quantity) pairs.
+
+    Every sell consumes a contiguous stretch of the item's buy stream. With Q
+    the running total of buy quantity and S the running total of sell
+    quantity, the end of that stretch is C_k = min(C_k-1 + q_k, B_k), B_k
+    being what was bought before sell k (a sell can't use later buys). That
+    recurrence unrolls to C = S + min(0, cummin(B - S)), and a sell's cost
+    basis is the buy value between C_k-1 and C_k, read off the prefix sums.
+
+    Only exact for whole-number quantities: the loop engine drops a lot a
+    sell leaves with <= LOT_EPSILON, which moves every later boundary, and
+    with whole numbers nothing between 0 and 1 is ever left over.
+    """
+    buys = positions[is_buy[positions]]
+    sells = positions[is_sell[positions]]
+
+    buy_qty = np.maximum(quantities[buys], 0.0)
+    buy_prices = prices[buys]
+    cum_qty = np.cumsum(buy_qty)
+    cum_value = np.cumsum(buy_qty * buy_prices)
+
+    consumed = 0.0
+    if len(sells):
+        sell_qty = np.maximum(quantities[sells], 0.0)
+        bought_before = np.concatenate(([0.0], cum_qty))[np.searchsorted(buys, sells)]
+        sold = np.cumsum(sell_qty)
+        matched_to = sold + np.minimum(0.0, np.minimum.accumulate(bought_before - sold))
+        matched_from = np.concatenate(([0.0], matched_to[:-1]))
+
+        cost_basis = (
+            _cost_of_first_units(matched_to, cum_qty, cum_value, buy_prices) -
+            _cost_of_first_units(matched_from, cum_qty, cum_value, buy_prices)
+        )
+        sale_value = prices[sells] * quantities[sells]
+        fee = sale_value * SELL_FEE_RATE
+        realised[sells] = (sale_value - fee) - cost_basis
+        consumed = matched_to[-1]
+
+    remaining = np.minimum(buy_qty, cum_qty - consumed)
+    keep = (remaining > 0) & ((remaining == buy_qty) | (remaining > LOT_EPSILON))
+    return zip(buys[keep], remaining[keep])
+
+
+def calculate_fifo_numpy(user):
+    """
+    Same results as trades.fifo.calculate_fifo_for_user (full replay), computed
+    per item with NumPy prefix sums instead of a Python loop over lots. Items
+    traded in fractional quantities are replayed with the loop engine's lot
+    matching instead (see _match_item). Realised profits agree with the loop
+    engine to floating-point rounding;
+    cumulative profit is the running sum of those, in history order (only
+    realised_profit is written when store_cumulative_profit() is off).
+    """
+    User = get_user_model()
+    if not user or not isinstance(user, User):
+        print(f"FIFO Calc: Invalid user object received: {user}")
+        return
+
+    with db_transaction.atomic():
+        rows = list(
+            Transaction.objects.filter(user=user)
+            .exclude(trans_type__in=PLACING_TYPES)
+            .order_by('date_of_holding', 'id')
+            .values_list('id', 'item_id', 'trans_type', 'price', 'quantity',
+                         'realised_profit', 'cumulative_profit', 'date_of_holding')
+        )
+
+        Transaction.objects.filter(user=user, trans_type__in=PLACING_TYPES).exclude(
+            realised_profit=0.0, cumulative_profit=0.0
+        ).update(realised_profit=0.0, cumulative_profit=0.0)
+
+        if not rows:
+            _sync_open_lots(user, {})
+            refresh_positions(user)
+            return
+
+        ids, item_ids, trans_types, prices, quantities, old_realised, old_cumulative, dates = zip(*rows)
+        ids = np.array(ids, dtype=np.int64)
+        item_ids = np.array(item_ids, dtype=np.int64)
+        trans_types = np.array(trans_types, dtype=object)
+        prices = np.array(prices, dtype=np.float64)
+        quantities = np.array(quantities, dtype=np.float64)
+        is_buy = np.isin(trans_types, BUY_TYPES)
+        is_sell = np.isin(trans_types, SELL_TYPES)
+
+        realised = np.zeros(len(ids), dtype=np.float64)
+        purchase_lots = {}
+
+        # Group row positions by item, keeping history order inside each group
+        order = np.argsort(item_ids, kind='stable')
+        unique_items, starts = np.unique(item_ids[order], return_index=True)
+        for item_id, positions in zip(unique_items, np.split(order, starts[1:])):
+            item_quantities = quantities[positions]
+            if np.array_equal(item_quantities, np.floor(item_quantities)):
+                open_lots = _match_item(positions, is_buy, is_sell, prices, quantities, realised)
+                purchase_lots[int(item_id)] = [
+                    {'qty': float(qty), 'price': float(prices[pos]), 'trans_id': int(ids[pos]), 'date': dates[pos]}
+                    for pos, qty in open_lots
+                ]
+            else:
+                # Fractional quantities: match lot by lot, dropping near-empty lots as the loop engine does
+                item_lots = {}
+                for pos in positions:
+                    realised[pos] = _replay_transaction(
+                        item_lots, int(ids[pos]), int(item_id), trans_types[pos],
+                        float(prices[pos]), float(quantities[pos]), dates[pos],
+                    )
+                purchase_lots[int(item_id)] = list(item_lots[int(item_id)])
+
+        cumulative = np.cumsum(realised)
+
+        changed_mask = realised != np.array(old_realised)
+        update_fields = ['realised_profit']
+        if store_cumulative_profit():
+            changed_mask |= cumulative != np.array(old_cumulative)
+            update_fields.append('cumulative_profit')
+        changed = [
+            Transaction(id=int(ids[pos]), realised_profit=float(realised[pos]), cumulative_profit=float(cumulative[pos]))
+            for pos in np.flatnonzero(changed_mask)
+        ]
+        Transaction.objects.bulk_update(changed, update_fields, batch_size=BULK_UPDATE_BATCH_SIZE)
+
+        _sync_open_lots(user, purchase_lots)
+        refresh_positions(user)
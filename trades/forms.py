@@ -8,6 +8,7 @@ from .models import (
     Transaction, Alias, Item, AccumulationPrice, TargetSellPrice,
     Membership, WealthData, Watchlist, UserProfile, PRIORITIZED_TIMEZONE_CHOICES
 )
+from .item_resolver import get_or_create_item
 
 TIMEZONE_CHOICES = [(tz, tz) for tz in pytz.common_timezones]
 
@@ -43,19 +44,8 @@ class TransactionManualItemForm(forms.Form):
         # --- REMOVE date_of_holding from cleaned_data ---
         # date_of_holding = self.cleaned_data['date_of_holding']
 
-        # ... (logic to find/create item_obj remains the same) ...
-        alias = Alias.objects.filter(short_name__iexact=name_input).first()
-        if not alias:
-            alias = Alias.objects.filter(full_name__iexact=name_input).first()
-
-        if alias:
-            item_obj = Item.objects.filter(name__iexact=alias.full_name).first()
-            if not item_obj:
-                item_obj = Item.objects.create(name=alias.full_name)
-        else:
-            item_obj = Item.objects.filter(name__iexact=name_input).first()
-            if not item_obj:
-                item_obj = Item.objects.create(name=name_input)
+        # Alias short name -> alias full name -> item name, creating the item if needed
+        item_obj = get_or_create_item(name_input)
 
 
         new_trans = Transaction.objects.create(
@@ -94,19 +84,8 @@ class PlacingOrderForm(forms.Form):
         # --- REMOVE date_of_holding from cleaned_data ---
         # date_of_holding = self.cleaned_data['date_of_holding']
 
-        # ... (logic to find/create item_obj remains the same) ...
-        alias = Alias.objects.filter(short_name__iexact=name_input).first()
-        if not alias:
-            alias = Alias.objects.filter(full_name__iexact=name_input).first()
-
-        if alias:
-            item_obj = Item.objects.filter(name__iexact=alias.full_name).first()
-            if not item_obj:
-                item_obj = Item.objects.create(name=alias.full_name)
-        else:
-            item_obj = Item.objects.filter(name__iexact=name_input).first()
-            if not item_obj:
-                item_obj = Item.objects.create(name=name_input)
+        # Alias short name -> alias full name -> item name, creating the item if needed
+        item_obj = get_or_create_item(name_input)
 
 
         new_trans = Transaction.objects.create(
@@ -159,21 +138,12 @@ class TransactionEditForm(forms.Form):
         # --- REMOVE date_of_holding from cleaned_data ---
         # date_of_holding = self.cleaned_data['date_of_holding']
 
-        # ... (logic to find/create item_obj remains the same) ...
-        alias = Alias.objects.filter(short_name__iexact=name_input).first()
-        if not alias:
-            alias = Alias.objects.filter(full_name__iexact=name_input).first()
-
-        if alias:
-            item_obj = Item.objects.filter(name__iexact=alias.full_name).first()
-            if not item_obj:
-                item_obj = Item.objects.create(name=alias.full_name)
-        else:
-            item_obj = Item.objects.filter(name__iexact=name_input).first()
-            if not item_obj:
-                item_obj = Item.objects.create(name=name_input)
+        # Alias short name -> alias full name -> item name, creating the item if needed
+        item_obj = get_or_create_item(name_input)
 
 
+        # Remember the old item so the caller can re-match both items' lots
+        self.previous_item_id = transaction.item_id
         transaction.item = item_obj
         transaction.trans_type = trans_type
         transaction.price = price
@@ -0,0 +1,309 @@
+# trades/item_resolver.py
+# Name -> Item lookups (alias short name, alias full name, item name) and
+# search-box autocomplete, served from an in-memory, upper-cased copy of the
+# Alias and Item tables.
+import bisect
+import heapq
+import threading
+import time
+import uuid
+
+import numpy as np
+from django.core.cache import cache
+from django.db import transaction as db_transaction
+
+from .models import Alias, Item
+
+VERSION_KEY = 'trades:item_resolver:version'
+
+NGRAM_SIZE = 3
+FUZZY_MIN_SIMILARITY = 0.3  # Share of n-grams a fuzzy match must have in common with the query
+VERSION_CHECK_SECONDS = 1.0  # How long a version check is trusted (outside requests, see recheck_resolver_version)
+
+_lock = threading.Lock()
+_state = {'version': None, 'maps': None, 'checked_at': None}
+
+
+def _fold(name):
+    """
+    Upper-case `name` the way SQL UPPER() (and so __iexact) does: character
+    by character, leaving alone the few characters that only upper-case to
+    several ('ß' stays 'ß', unlike 'ß'.upper() == 'SS'). Nothing is stripped.
+    """
+    name = name or ''
+    upper = name.upper()
+    if len(upper) == len(name):
+        return upper
+    return ''.join(char if len(char.upper()) > 1 else char.upper() for char in name)
+
+
+def _current_version():
+    """
+    The version token shared through the cache backend. Any process that
+    changes an Alias/Item replaces it, which makes every other process
+    rebuild its maps the next time it checks (see _maps()).
+    """
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        version = uuid.uuid4().hex
+        if not cache.add(VERSION_KEY, version, timeout=None):
+            version = cache.get(VERSION_KEY, version)
+    return version
+
+
+def _build_maps():
+    """
+    Load both tables once. When several rows fold to the same name the one
+    with the lowest id wins, as `.filter(...__iexact=...).first()` did.
+    Aliases are tied to items through Alias.item where it is set, and by
+    matching full_name to the item name for rows not backfilled yet.
+    """
+    items = {}
+    items_by_id = {}
+    for item_id, name in Item.objects.order_by('id').values_list('id', 'name'):
+        items.setdefault(_fold(name), (item_id, name))
+        items_by_id[item_id] = (item_id, name)
+
+    aliases = {}
+    alias_items = {}
+    by_short_name = {}
+    by_full_name = {}
+    by_item = {}
+    for alias in Alias.objects.order_by('id'):
+        aliases[alias.id] = alias
+        if alias.short_name:
+            by_short_name.setdefault(_fold(alias.short_name), alias.id)
+        by_full_name.setdefault(_fold(alias.full_name), alias.id)
+        found = items_by_id.get(alias.item_id) or items.get(_fold(alias.full_name))
+        if found:
+            alias_items[alias.id] = found
+            by_item.setdefault(found[0], alias.id)
+
+    return {
+        'aliases': aliases,
+        'alias_items': alias_items,
+        'by_short_name': by_short_name,
+        'by_full_name': by_full_name,
+        'by_item': by_item,
+        'items': items,
+    }
+
+
+def _ngrams(folded):
+    padded = f" {folded} "
+    return {padded[i:i + NGRAM_SIZE] for i in range(len(padded) - NGRAM_SIZE + 1)}
+
+
+def _build_suggestions(maps):
+    """
+    Everything a user can type into the search box, as suggestion dicts
+    (value to search for, label to show, item it resolves to), plus:
+      - `keys`: the folded values, sorted, for prefix search by bisection
+      - `ngrams`: n-gram -> array of suggestion positions, and
+        `ngram_counts`: n-grams per suggestion, for fuzzy matches
+    Built on first use by suggest_items() after every change, so plain name
+    resolution never pays for it.
+    """
+    entries = {}
+    for alias in maps['aliases'].values():
+        if alias.short_name:
+            entries.setdefault(_fold(alias.short_name), {
+                'value': alias.short_name, 'label': f"{alias.short_name} ({alias.full_name})", 'item': alias.full_name,
+            })
+        entries.setdefault(_fold(alias.full_name), {
+            'value': alias.full_name, 'label': alias.full_name, 'item': alias.full_name,
+        })
+    for _, name in maps['items'].values():
+        entries.setdefault(_fold(name), {'value': name, 'label': name, 'item': name})
+
+    keys = sorted(key for key in entries if key)
+    suggestions = [entries[key] for key in keys]
+    postings = {}
+    gram_counts = np.zeros(len(keys), dtype=np.int32)
+    for position, key in enumerate(keys):
+        grams = _ngrams(key)
+        gram_counts[position] = len(grams)
+        for gram in grams:
+            postings.setdefault(gram, []).append(position)
+
+    return {
+        'keys': keys,
+        'suggestions': suggestions,
+        'ngrams': {gram: np.array(positions, dtype=np.int32) for gram, positions in postings.items()},
+        'ngram_counts': gram_counts,
+    }
+
+
+def _maps():
+    now = time.monotonic()
+    maps = _state['maps']
+    checked_at = _state['checked_at']
+    if maps is not None and checked_at is not None and now - checked_at < VERSION_CHECK_SECONDS:
+        return maps
+    version = _current_version()
+    with _lock:
+        if _state['maps'] is None or _state['version'] != version:
+            _state['maps'] = _build_maps()
+            _state['version'] = version
+        _state['checked_at'] = now
+        return _state['maps']
+
+
+def recheck_resolver_version():
+    """
+    Look at the shared version again on the next lookup. Called when a
+    request starts, so a request sees other processes' changes but checks
+    the version once however many names it resolves.
+    """
+    _state['checked_at'] = None
+
+
+def _copy_alias(alias):
+    # Hand out a fresh instance so callers can't change the cached one
+    field_names = [field.attname for field in Alias._meta.concrete_fields]
+    values = [alias.__dict__[name] for name in field_names]
+    return Alias.from_db(alias._state.db, field_names, values)
+
+
+def _make_item(found):
+    return Item.from_db(None, ['id', 'name'], found) if found else None
+
+
+def resolve_alias_and_item(name):
+    """
+    Resolve a user-typed name the way the search box always has: alias short
+    name first, then alias full name (both case-insensitive), then the item
+    name itself. Returns (alias, item); either may be None.
+    """
+    maps = _maps()
+    folded = _fold(name)
+    alias_id = maps['by_short_name'].get(folded) or maps['by_full_name'].get(folded)
+    if alias_id is not None:
+        return _copy_alias(maps['aliases'][alias_id]), _make_item(maps['alias_items'].get(alias_id))
+    return None, _make_item(maps['items'].get(folded))
+
+
+def resolve_item(name):
+    """The Item a user-typed name refers to, or None."""
+    return resolve_alias_and_item(name)[1]
+
+
+def get_or_create_item(name):
+    """
+    resolve_item(), creating the Item when nothing matches (named after the
+    alias's full name if an alias matched, otherwise after `name`). A miss
+    is checked against the table first: another process may have added the
+    item since these maps were loaded.
+    """
+    alias, item = resolve_alias_and_item(name)
+    if item is None:
+        item_name = alias.full_name if alias else name.strip()
+        item = Item.objects.filter(name__iexact=item_name).order_by('id').first()
+        if item is None:
+            item, _ = Item.objects.get_or_create(name=item_name)
+    return item
+
+
+def alias_for_item(item):
+    """The (first) alias that belongs to `item`, or None."""
+    maps = _maps()
+    alias_id = maps['by_item'].get(item.id)
+    return _copy_alias(maps['aliases'][alias_id]) if alias_id is not None else None
+
+
+def suggest_items(query, limit=10):
+    """
+    Autocomplete for the item search box: up to `limit` suggestions whose
+    name starts with `query` (shortest first), topped up with fuzzy matches
+    that share enough n-grams with it to survive a typo or a word in the
+    middle. Everything comes from the in-memory maps, so no query is issued.
+    """
+    folded = _fold(query)
+    if not folded or limit < 1:
+        return []
+    maps = _maps()
+    if 'suggest' not in maps:
+        with _lock:
+            if 'suggest' not in maps:
+                maps['suggest'] = _build_suggestions(maps)
+    index = maps['suggest']
+    keys, suggestions = index['keys'], index['suggestions']
+
+    # Prefix matches sit in one contiguous run of the sorted keys
+    start = bisect.bisect_left(keys, folded)
+    end = bisect.bisect_left(keys, folded + '\U0010ffff', lo=start)
+    prefix_positions = heapq.nsmallest(limit, range(start, end), key=lambda pos: (len(keys[pos]), keys[pos]))
+    results = [dict(suggestions[pos]) for pos in prefix_positions]
+    if len(results) >= limit or len(folded) < NGRAM_SIZE - 1:
+        return results
+
+    query_grams = _ngrams(folded)
+    postings = [index['ngrams'][gram] for gram in query_grams if gram in index['ngrams']]
+    if not postings:
+        return results
+
+    # Count shared n-grams for every suggestion at once, then score by Jaccard similarity
+    shared = np.bincount(np.concatenate(postings), minlength=len(keys))
+    similarity = shared / (len(query_grams) + index['ngram_counts'] - shared)
+    similarity[prefix_positions] = 0.0
+    candidates = np.flatnonzero(similarity >= FUZZY_MIN_SIMILARITY)
+    wanted = limit - len(results)
+    if len(candidates) > wanted:
+        candidates = candidates[np.argpartition(-similarity[candidates], wanted - 1)[:wanted]]
+    best = sorted(candidates.tolist(), key=lambda pos: (-similarity[pos], len(keys[pos])))
+    results.extend(dict(suggestions[pos]) for pos in best)
+    return results
+
+
+def _build_image_urls(maps):
+    """
+    item id -> image URL, taken from the first alias (lowest id) of the
+    item that has an uploaded image.
+    """
+    storage = Alias._meta.get_field('image_file').storage
+    urls = {}
+    for alias in maps['aliases'].values():
+        image_name = alias.__dict__['image_file']
+        if not image_name:
+            continue
+        found = maps['alias_items'].get(alias.id)
+        if found and found[0] not in urls:
+            urls[found[0]] = storage.url(str(image_name))
+    return urls
+
+
+def item_image_urls():
+    """
+    Map of item id -> alias image URL for every item that has one. Built
+    from the in-memory alias maps, so tables can show icons for any number
+    of rows without a query per row.
+    """
+    maps = _maps()
+    if 'image_urls' not in maps:
+        with _lock:
+            if 'image_urls' not in maps:
+                maps['image_urls'] = _build_image_urls(maps)
+    return maps['image_urls']
+
+
+def attach_item_image_urls(rows):
+    """Set `item_image_url` (URL or None) on each row (anything with an item_id) and return the rows."""
+    urls = item_image_urls()
+    for row in rows:
+        row.item_image_url = urls.get(row.item_id)
+    return rows
+
+
+def invalidate_resolver_cache():
+    """
+    Drop this process's maps and publish a new version so other workers
+    reload too. Called from the Alias/Item post_save/post_delete signals;
+    the version is bumped again on commit so nobody keeps a copy that was
+    loaded before the change became visible.
+    """
+    def bump():
+        _state['maps'] = None
+        cache.set(VERSION_KEY, uuid.uuid4().hex, timeout=None)
+
+    bump()
+    db_transaction.on_commit(bump)
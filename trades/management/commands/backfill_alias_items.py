@@ -0,0 +1,80 @@
+# trades/management/commands/backfill_alias_items.py
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction as db_transaction
+from django.db.models.functions import Upper
+
+from trades.item_resolver import invalidate_resolver_cache
+from trades.models import Alias, Item
+
+
+class Command(BaseCommand):
+    help = "Link Alias rows to the Item whose name matches their full_name (sets Alias.item), in chunks."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Aliases handled per chunk/transaction (default 1000).",
+        )
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Re-check every alias, not only the ones that aren't linked yet.",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        if batch_size < 1:
+            raise CommandError("--batch-size must be at least 1.")
+
+        aliases = Alias.objects.order_by("id")
+        if not options["all"]:
+            aliases = aliases.filter(item__isnull=True)
+
+        linked = unmatched = 0
+        last_id = 0
+        while True:
+            # Walk the table by primary key so each chunk is a cheap range scan
+            # Both sides are upper-cased by the database, as __iexact does (Python's
+            # str.upper() differs from SQL UPPER() outside ASCII)
+            chunk = list(
+                aliases.filter(id__gt=last_id)
+                .annotate(upper_full_name=Upper("full_name"))
+                .only("id", "full_name", "item_id")[:batch_size]
+            )
+            if not chunk:
+                break
+            last_id = chunk[-1].id
+
+            wanted = {alias.upper_full_name for alias in chunk}
+            items = {}
+            matches = (
+                Item.objects.annotate(upper_name=Upper("name"))
+                .filter(upper_name__in=wanted)
+                .order_by("id")
+                .values_list("upper_name", "id")
+            )
+            for upper_name, item_id in matches:
+                # Items differing only in case: the lowest id wins, as in Alias.save() and the resolver
+                items.setdefault(upper_name, item_id)
+
+            changed = []
+            for alias in chunk:
+                item_id = items.get(alias.upper_full_name)
+                if item_id is None:
+                    unmatched += 1
+                if item_id != alias.item_id:
+                    alias.item_id = item_id
+                    changed.append(alias)
+            with db_transaction.atomic():
+                Alias.objects.bulk_update(changed, ["item"])
+            linked += sum(1 for alias in changed if alias.item_id is not None)
+            self.stdout.write(f"  ...up to alias id {last_id}: {len(changed)} updated")
+
+        # bulk_update doesn't send post_save, so refresh the resolver by hand
+        invalidate_resolver_cache()
+        self.stdout.write(self.style.SUCCESS(
+            f"Linked {linked} alias(es) to their item; {unmatched} alias(es) have no matching item."
+        ))
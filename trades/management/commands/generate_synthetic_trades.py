@@ -0,0 +1,116 @@
+# trades/management/commands/generate_synthetic_trades.py
+
+import random
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth import get_user_model
+from django.db import transaction as db_transaction
+from django.utils import timezone
+
+from trades.fifo import calculate_fifo_for_user
+from trades.models import Item, Transaction
+
+
+class Command(BaseCommand):
+    help = (
+        "Create N users x M items x K trades of synthetic history (interleaved buys/sells "
+        "with partial fills) for benchmarking. Users are named '<prefix><n>' and items '<prefix>item_<m>'."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=5, help="Number of users to create (default 5).")
+        parser.add_argument("--items", type=int, default=20, help="Number of items each user trades (default 20).")
+        parser.add_argument("--trades", type=int, default=200, help="Trades per user per item (default 200).")
+        parser.add_argument("--days", type=int, default=365, help="Spread the history over this many days (default 365).")
+        parser.add_argument("--placing-ratio", type=float, default=0.05, help="Share of trades that are open placing orders (default 0.05).")
+        parser.add_argument("--seed", type=int, default=1, help="Random seed, so runs are reproducible (default 1).")
+        parser.add_argument("--prefix", type=str, default="synthetic_", help="Name prefix for the generated users and items.")
+        parser.add_argument("--clear", action="store_true", help="Delete previously generated users with this prefix first.")
+
+    def handle(self, *args, **options):
+        n_users, n_items, n_trades = options["users"], options["items"], options["trades"]
+        if min(n_users, n_items, n_trades) < 1:
+            raise CommandError("--users, --items and --trades must all be at least 1.")
+        prefix = options["prefix"]
+        rng = random.Random(options["seed"])
+        User = get_user_model()
+
+        if options["clear"]:
+            deleted, _ = User.objects.filter(username__startswith=prefix).delete()
+            self.stdout.write(f"Deleted {deleted} rows belonging to earlier '{prefix}' users.")
+
+        start = timezone.now() - timedelta(days=options["days"])
+        span_seconds = options["days"] * 86400
+
+        with db_transaction.atomic():
+            items = [
+                Item.objects.get_or_create(name=f"{prefix}item_{m}")[0]
+                for m in range(n_items)
+            ]
+            users = []
+            for n in range(n_users):
+                username = f"{prefix}{n}"
+                if User.objects.filter(username=username).exists():
+                    raise CommandError(f"User '{username}' already exists (use --clear to replace it).")
+                user = User.objects.create(username=username)
+                user.set_unusable_password()
+                user.save(update_fields=["password"])
+                users.append(user)
+
+            created = 0
+            for user in users:
+                rows = []
+                for item in items:
+                    rows.extend(self.item_history(user, item, n_trades, start, span_seconds, options["placing_ratio"], rng))
+                Transaction.objects.bulk_create(rows, batch_size=1000)
+                created += len(rows)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {n_users} user(s) x {n_items} item(s) x {n_trades} trade(s) = {created} transactions."
+        ))
+
+        # bulk_create skips every maintenance path: the replay fills in profits,
+        # the OpenLot ledger and Position rows, so later adds start from a real ledger
+        for user in users:
+            calculate_fifo_for_user(user)
+        self.stdout.write(self.style.SUCCESS("FIFO profits, open lots and positions calculated."))
+
+    def item_history(self, user, item, n_trades, start, span_seconds, placing_ratio, rng):
+        """
+        One user's trades in one item: the price follows a random walk, the
+        position is built up with buys and worked down with partial sells, and
+        an order is sometimes filled in several pieces at nearby times.
+        """
+        price = float(rng.randint(1, 2000) * 1000)
+        held = 0.0
+        times = sorted(rng.uniform(0, span_seconds) for _ in range(n_trades))
+        rows = []
+        for offset in times:
+            price = max(1000.0, round(price * rng.uniform(0.97, 1.03)))
+            when = start + timedelta(seconds=offset)
+
+            if rng.random() < placing_ratio:
+                trans_type = rng.choice([Transaction.PLACING_BUY, Transaction.PLACING_SELL])
+                quantity = float(rng.randint(1, 500))
+            elif held <= 0 or rng.random() < 0.55:
+                trans_type = Transaction.BUY if rng.random() < 0.8 else Transaction.INSTANT_BUY
+                quantity = float(rng.randint(1, 500))
+                held += quantity
+            else:
+                trans_type = Transaction.SELL if rng.random() < 0.8 else Transaction.INSTANT_SELL
+                # Usually sell part of what's held, now and then all of it
+                quantity = held if rng.random() < 0.2 else float(max(1, int(held * rng.uniform(0.1, 0.7))))
+                held -= quantity
+
+            # Partial fills: the order lands as a few smaller trades a little apart
+            pieces = rng.randint(2, 3) if quantity >= 10 and rng.random() < 0.15 else 1
+            remaining = quantity
+            for piece in range(pieces):
+                fill = remaining if piece == pieces - 1 else float(max(1, int(remaining * rng.uniform(0.3, 0.6))))
+                remaining -= fill
+                rows.append(Transaction(
+                    user=user, item=item, trans_type=trans_type,
+                    price=price, quantity=fill,
+                    date_of_holding=when + timedelta(seconds=piece * rng.randint(1, 120)),
+                ))
+        return rows
@@ -13,7 +13,7 @@ from trades.models import (
     Membership, WealthData, Watchlist, Transaction
 )
 # Use the new function that can recalc for all users, but only once at end.
-from trades.views import calculate_fifo_for_all_users
+from trades.fifo import FIFO_ENGINES, calculate_fifo_for_all_users
 
 
 class Command(BaseCommand):
@@ -26,6 +26,12 @@ class Command(BaseCommand):
             default=".",
             help="Directory containing the CSV files (default current directory).",
         )
+        parser.add_argument(
+            "--engine",
+            choices=FIFO_ENGINES,
+            default="loop",
+            help="FIFO engine for the final recalculation: 'loop' (default) or the vectorised 'numpy' engine.",
+        )
 
     @db_transaction.atomic
     def handle(self, *args, **options):
@@ -81,7 +87,7 @@ class Command(BaseCommand):
 
         # Recalc FIFO for all users (only once, after entire import).
         self.stdout.write(self.style.SUCCESS("Recalculating FIFO profits for all users..."))
-        calculate_fifo_for_all_users()
+        calculate_fifo_for_all_users(engine=options["engine"])
 
         self.stdout.write(self.style.SUCCESS("All CSV imports completed successfully!"))
 
@@ -0,0 +1,42 @@
+# trades/management/commands/process_fifo_jobs.py
+
+import time
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, close_old_connections
+
+from trades.fifo import process_fifo_jobs
+
+
+class Command(BaseCommand):
+    help = "Worker that runs queued FIFO recomputes, coalescing bursts of jobs per user into one replay."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Process whatever is queued now and exit instead of polling forever.",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=2.0,
+            help="Seconds to sleep when the queue is empty (default 2).",
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.SUCCESS("FIFO job worker started."))
+        while True:
+            # Reconnect if the database dropped the connection since the last pass
+            close_old_connections()
+            started = time.perf_counter()
+            try:
+                processed = process_fifo_jobs()
+            except OperationalError as exc:
+                self.stderr.write(f"Database error, retrying: {exc}")
+                processed = 0
+            if processed:
+                self.stdout.write(f"Recomputed {processed} user(s) in {time.perf_counter() - started:.2f}s.")
+            if options["once"]:
+                break
+            if not processed:
+                time.sleep(options["interval"])
@@ -0,0 +1,100 @@
+# trades/management/commands/recompute_fifo.py
+
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth import get_user_model
+from django.db import connections
+
+from trades.fifo import FIFO_ENGINES, PLACING_TYPES, get_fifo_engine
+from trades.models import Transaction
+
+
+def init_worker():
+    """Process pool initializer: make sure Django is set up and drop any inherited DB connection."""
+    import django
+    from django.apps import apps
+    if not apps.ready:
+        django.setup()
+    # Each worker opens its own connection on first query
+    connections.close_all()
+
+
+def recompute_user(user_id, engine):
+    """Recalculate one user; returns (username, transactions processed, seconds)."""
+    User = get_user_model()
+    user = User.objects.get(id=user_id)
+    started = time.perf_counter()
+    get_fifo_engine(engine)(user)
+    elapsed = time.perf_counter() - started
+    row_count = Transaction.objects.filter(user_id=user_id).exclude(trans_type__in=PLACING_TYPES).count()
+    return user.username, row_count, elapsed
+
+
+class Command(BaseCommand):
+    help = "Recalculate FIFO realised/cumulative profits from scratch."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--engine",
+            choices=FIFO_ENGINES,
+            default="loop",
+            help="FIFO engine to use: 'loop' (default) or the vectorised 'numpy' engine.",
+        )
+        parser.add_argument(
+            "--user",
+            action="append",
+            dest="usernames",
+            help="Only recalculate this username (can be given more than once). Default: every user with transactions.",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=1,
+            help="Number of worker processes, each with its own DB connection (default 1 = run in this process).",
+        )
+
+    def handle(self, *args, **options):
+        engine = options["engine"]
+        workers = options["workers"]
+        if workers < 1:
+            raise CommandError("--workers must be at least 1.")
+        get_fifo_engine(engine) # Fail early on a bad engine name
+        User = get_user_model()
+
+        users = User.objects.filter(transaction__isnull=False).distinct().order_by("id")
+        if options["usernames"]:
+            users = User.objects.filter(username__in=options["usernames"]).order_by("id")
+            missing = set(options["usernames"]) - set(users.values_list("username", flat=True))
+            if missing:
+                raise CommandError(f"Unknown user(s): {', '.join(sorted(missing))}")
+        user_ids = list(users.values_list("id", flat=True))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Recalculating FIFO for {len(user_ids)} user(s) with the '{engine}' engine and {workers} worker(s)..."
+        ))
+        started = time.perf_counter()
+        results = []
+        if workers == 1:
+            for user_id in user_ids:
+                results.append(recompute_user(user_id, engine))
+        else:
+            # Don't hand the parent's open connection to the forked workers
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=workers, initializer=init_worker) as pool:
+                futures = [pool.submit(recompute_user, user_id, engine) for user_id in user_ids]
+                for future in as_completed(futures):
+                    results.append(future.result())
+        wall_time = time.perf_counter() - started
+
+        # --- Report ---
+        self.stdout.write("Per-user timings (slowest first):")
+        for username, row_count, elapsed in sorted(results, key=lambda r: r[2], reverse=True):
+            self.stdout.write(f"  {username}: {row_count} transactions in {elapsed:.2f}s")
+
+        total_rows = sum(r[1] for r in results)
+        throughput = total_rows / wall_time if wall_time > 0 else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"Finished {len(results)} user(s), {total_rows} transactions in {wall_time:.2f}s "
+            f"({throughput:,.0f} transactions/sec)."
+        ))
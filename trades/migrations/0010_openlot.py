@@ -0,0 +1,73 @@
+# Generated by Django 5.2.18 on 2026-10-17 19:40
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def seed_open_lots(apps, schema_editor):
+    """
+    Replay every user's buys/sells once (same FIFO rules as trades.fifo) and
+    store the lots that are still open, so the ledger starts out in sync.
+    """
+    Transaction = apps.get_model('trades', 'Transaction')
+    OpenLot = apps.get_model('trades', 'OpenLot')
+    buy_types = ['Buy', 'Instant Buy']
+    sell_types = ['Sell', 'Instant Sell']
+
+    user_ids = Transaction.objects.filter(user__isnull=False).values_list('user_id', flat=True).distinct()
+    for user_id in user_ids:
+        lots = {}
+        rows = Transaction.objects.filter(
+            user_id=user_id, trans_type__in=buy_types + sell_types
+        ).order_by('date_of_holding', 'id').values_list('id', 'item_id', 'trans_type', 'price', 'quantity', 'date_of_holding')
+        for trans_id, item_id, trans_type, price, quantity, date_of_holding in rows.iterator():
+            item_lots = lots.setdefault(item_id, [])
+            if trans_type in buy_types:
+                item_lots.append([quantity, price, trans_id, date_of_holding])
+                continue
+            sold = 0
+            for lot in list(item_lots):
+                if sold >= quantity:
+                    break
+                use = min(quantity - sold, lot[0])
+                if use <= 0: continue
+                lot[0] -= use
+                sold += use
+                if lot[0] <= 0.0001:
+                    item_lots.remove(lot)
+
+        OpenLot.objects.bulk_create([
+            OpenLot(user_id=user_id, item_id=item_id, source_transaction_id=trans_id,
+                    quantity=qty, price=price, date_of_holding=date_of_holding)
+            for item_id, item_lots in lots.items()
+            for qty, price, trans_id, date_of_holding in item_lots
+            if qty > 0
+        ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trades', '0009_alter_userprofile_time_zone'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OpenLot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.FloatField()),
+                ('price', models.FloatField()),
+                ('date_of_holding', models.DateTimeField()),
+                ('item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='trades.item')),
+                ('source_transaction', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='open_lot', to='trades.transaction')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='open_lots', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'item', 'date_of_holding'], name='trades_open_user_id_7caebc_idx')],
+            },
+        ),
+        migrations.RunPython(seed_open_lots, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-17 19:53
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trades', '0012_fiforecomputejob_item'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='alias',
+            index=models.Index(django.db.models.functions.text.Upper('short_name'), name='alias_short_name_upper_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='alias',
+            index=models.Index(django.db.models.functions.text.Upper('full_name'), name='alias_full_name_upper_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='item',
+            index=models.Index(django.db.models.functions.text.Upper('name'), name='item_name_upper_idx'),
+        ),
+    ]
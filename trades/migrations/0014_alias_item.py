@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-17 19:57
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trades', '0013_name_upper_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='alias',
+            name='item',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='aliases', to='trades.item'),
+        ),
+    ]
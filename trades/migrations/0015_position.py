@@ -0,0 +1,69 @@
+# Generated by Django 5.2.18 on 2026-10-17 19:59
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Avg, Count, Max, Q, Sum
+
+
+def seed_positions(apps, schema_editor):
+    """Build a Position row for every (user, item) with buy/sell history."""
+    Transaction = apps.get_model('trades', 'Transaction')
+    Position = apps.get_model('trades', 'Position')
+    is_buy = Q(trans_type__in=['Buy', 'Instant Buy'])
+    is_sell = Q(trans_type__in=['Sell', 'Instant Sell'])
+
+    rows = (
+        Transaction.objects.filter(user__isnull=False)
+        .exclude(trans_type__in=['Placing Buy', 'Placing Sell'])
+        .order_by()
+        .values('user_id', 'item_id')
+        .annotate(
+            bought=Sum('quantity', filter=is_buy, default=0.0),
+            sold=Sum('quantity', filter=is_sell, default=0.0),
+            sell_count=Count('id', filter=is_sell),
+            avg_sold_price=Avg('price', filter=is_sell, default=0.0),
+            realised=Sum('realised_profit', default=0.0),
+            last_trade_at=Max('date_of_holding'),
+        )
+    )
+    Position.objects.bulk_create([
+        Position(
+            user_id=row['user_id'], item_id=row['item_id'],
+            total_bought=row['bought'], total_sold=row['sold'],
+            remaining_quantity=row['bought'] - row['sold'],
+            sell_count=row['sell_count'], average_sold_price=row['avg_sold_price'],
+            realised_profit=row['realised'], last_trade_at=row['last_trade_at'],
+        )
+        for row in rows.iterator()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trades', '0014_alias_item'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Position',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_bought', models.FloatField(default=0.0)),
+                ('total_sold', models.FloatField(default=0.0)),
+                ('remaining_quantity', models.FloatField(default=0.0)),
+                ('sell_count', models.IntegerField(default=0)),
+                ('average_sold_price', models.FloatField(default=0.0)),
+                ('realised_profit', models.FloatField(default=0.0)),
+                ('last_trade_at', models.DateTimeField(blank=True, null=True)),
+                ('item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='trades.item')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='positions', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('user', 'item'), name='unique_position_per_user_item')],
+            },
+        ),
+        migrations.RunPython(seed_positions, migrations.RunPython.noop),
+    ]
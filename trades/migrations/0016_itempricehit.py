@@ -0,0 +1,57 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:01
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_price_hits(apps, schema_editor):
+    """Record the current last hits for every item that has a threshold set."""
+    Transaction = apps.get_model('trades', 'Transaction')
+    AccumulationPrice = apps.get_model('trades', 'AccumulationPrice')
+    TargetSellPrice = apps.get_model('trades', 'TargetSellPrice')
+    ItemPriceHit = apps.get_model('trades', 'ItemPriceHit')
+
+    def latest(item_id, trans_types, price_filter):
+        return (
+            Transaction.objects.filter(item_id=item_id, trans_type__in=trans_types, **price_filter)
+            .order_by('-date_of_holding', '-id')
+            .values_list('id', 'date_of_holding')
+            .first()
+        ) or (None, None)
+
+    accumulation = dict(AccumulationPrice.objects.values_list('item_id', 'accumulation_price'))
+    target = dict(TargetSellPrice.objects.values_list('item_id', 'target_sell_price'))
+    hits = []
+    for item_id in set(accumulation) | set(target):
+        acc_hit, acc_at = (None, None)
+        if item_id in accumulation:
+            acc_hit, acc_at = latest(item_id, ['Buy', 'Instant Buy'], {'price__lte': accumulation[item_id]})
+        target_hit, target_at = (None, None)
+        if item_id in target:
+            target_hit, target_at = latest(item_id, ['Sell', 'Instant Sell'], {'price__gte': target[item_id]})
+        hits.append(ItemPriceHit(
+            item_id=item_id, accumulation_hit_id=acc_hit, accumulation_hit_at=acc_at,
+            target_hit_id=target_hit, target_hit_at=target_at,
+        ))
+    ItemPriceHit.objects.bulk_create(hits, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trades', '0015_position'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ItemPriceHit',
+            fields=[
+                ('item', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='price_hit', serialize=False, to='trades.item')),
+                ('accumulation_hit_at', models.DateTimeField(blank=True, null=True)),
+                ('target_hit_at', models.DateTimeField(blank=True, null=True)),
+                ('accumulation_hit', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='trades.transaction')),
+                ('target_hit', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='trades.transaction')),
+            ],
+        ),
+        migrations.RunPython(backfill_price_hits, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:05
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trades', '0016_itempricehit'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['item', 'date_of_holding', 'id'], name='transaction_item_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['item', 'trans_type', 'date_of_holding', 'id'], name='transaction_item_type_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(condition=models.Q(('trans_type__in', ['Placing Buy', 'Placing Sell'])), fields=['date_of_holding', 'id'], name='transaction_placing_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(condition=models.Q(('trans_type__in', ['Placing Buy', 'Placing Sell'])), fields=['item', 'date_of_holding', 'id'], name='transaction_placing_item_idx'),
+        ),
+    ]
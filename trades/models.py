@@ -2,6 +2,7 @@
 
 import pytz # Import pytz
 from django.db import models
+from django.db.models.functions import Upper
 from django.utils import timezone
 # Use AUTH_USER_MODEL for flexibility
 from django.conf import settings # Import settings
@@ -37,6 +38,23 @@ class Alias(models.Model):
     short_name = models.CharField(max_length=100, blank=True)
     image_path = models.CharField(max_length=300, blank=True)
     image_file = models.ImageField(upload_to='aliases/', blank=True, null=True)
+    # The item whose name matches full_name (case-insensitively). Kept in step
+    # by Alias.save()/Item.save(); existing rows: `manage.py backfill_alias_items`
+    item = models.ForeignKey('Item', on_delete=models.SET_NULL, null=True, blank=True, related_name='aliases')
+
+    class Meta:
+        # Name lookups use __iexact, i.e. UPPER(column) = UPPER(%s) on PostgreSQL
+        indexes = [
+            models.Index(Upper('short_name'), name='alias_short_name_upper_idx'),
+            models.Index(Upper('full_name'), name='alias_full_name_upper_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        self.item = Item.objects.filter(name__iexact=self.full_name).order_by('id').first()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'full_name' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'item'}
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.short_name} -> {self.full_name}"
@@ -46,6 +64,19 @@ class Item(models.Model):
     # ... (Item model definition remains the same) ...
     name = models.CharField(max_length=200, unique=True)
 
+    class Meta:
+        indexes = [
+            models.Index(Upper('name'), name='item_name_upper_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # Re-point aliases at this item after a create or rename; of items differing
+        # only in case the lowest id keeps them, as in Alias.save()
+        self.aliases.exclude(full_name__iexact=self.name).update(item=None)
+        if not Item.objects.filter(name__iexact=self.name, id__lt=self.id).exists():
+            Alias.objects.filter(full_name__iexact=self.name).exclude(item=self).update(item=self)
+
     def __str__(self):
         return self.name
 
@@ -82,12 +113,88 @@ class Transaction(models.Model):
     class Meta:
         indexes = [
             models.Index(fields=['user', 'date_of_holding']),
+            # An item's history across all users, newest first (history table, last trade, price chart)
+            models.Index(fields=['item', 'date_of_holding', 'id'], name='transaction_item_date_idx'),
+            # An item's trades of given types, newest first (accumulation/target price hits)
+            models.Index(fields=['item', 'trans_type', 'date_of_holding', 'id'], name='transaction_item_type_date_idx'),
+            # Placing orders are a small slice of the table: index only those rows
+            models.Index(
+                fields=['date_of_holding', 'id'], name='transaction_placing_date_idx',
+                condition=models.Q(trans_type__in=['Placing Buy', 'Placing Sell']),
+            ),
+            models.Index(
+                fields=['item', 'date_of_holding', 'id'], name='transaction_placing_item_idx',
+                condition=models.Q(trans_type__in=['Placing Buy', 'Placing Sell']),
+            ),
         ]
 
     def __str__(self):
         return f"{self.item.name} {self.trans_type} {self.quantity} @ {self.price}"
 
 
+class OpenLot(models.Model):
+    """
+    A purchase lot (or what is left of it) that FIFO sells have not consumed yet.
+    Kept in sync by trades.fifo so new sells and holdings lookups don't need
+    to replay the user's whole history.
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='open_lots')
+    item = models.ForeignKey(Item, on_delete=models.CASCADE)
+    source_transaction = models.OneToOneField(Transaction, on_delete=models.CASCADE, related_name='open_lot')
+    quantity = models.FloatField() # Remaining quantity
+    price = models.FloatField()
+    date_of_holding = models.DateTimeField() # Copied from the source transaction for FIFO ordering
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'item', 'date_of_holding']),
+        ]
+
+    def __str__(self):
+        return f"{self.item.name} lot {self.quantity} @ {self.price}"
+
+
+class Position(models.Model):
+    """
+    A user's running totals for one item (placing orders left out), so the
+    item stats panel and the holdings page read one row instead of
+    aggregating the raw history. Kept in sync by trades.fifo: adds update it
+    in place, replays (edits/deletes) re-aggregate the affected items.
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='positions')
+    item = models.ForeignKey(Item, on_delete=models.CASCADE)
+    total_bought = models.FloatField(default=0.0)
+    total_sold = models.FloatField(default=0.0)
+    remaining_quantity = models.FloatField(default=0.0)
+    sell_count = models.IntegerField(default=0) # Number of sells behind average_sold_price
+    average_sold_price = models.FloatField(default=0.0)
+    realised_profit = models.FloatField(default=0.0)
+    last_trade_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'item'], name='unique_position_per_user_item'),
+        ]
+
+    def __str__(self):
+        return f"{self.user} {self.item.name}: {self.remaining_quantity}"
+
+
+class FifoRecomputeJob(models.Model):
+    """
+    A queued request to replay a user's FIFO profits from `since` onwards
+    (None = full replay), for one item or all of them (item=None). Processed
+    and coalesced per user by the process_fifo_jobs management command.
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='fifo_jobs')
+    item = models.ForeignKey(Item, on_delete=models.CASCADE, null=True, blank=True)
+    since = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"FIFO recompute for {self.user} since {self.since or 'the start'}"
+
+
 class AccumulationPrice(models.Model):
     item = models.OneToOneField(Item, on_delete=models.CASCADE)
     accumulation_price = models.FloatField(default=0.0)
@@ -104,6 +211,30 @@ class TargetSellPrice(models.Model):
         return f"{self.item.name} Target Sell = {self.target_sell_price}"
 
 
+class ItemPriceHit(models.Model):
+    """
+    The latest buy (any user) at or below an item's accumulation price and
+    the latest sell at or above its target sell price, kept up to date by
+    trades.price_hits when transactions are added/edited/deleted and when
+    a threshold changes, so the item page reads them with a key lookup.
+    Kept current by model signals: after a queryset .update() or
+    bulk_create() of transactions or thresholds, call
+    trades.price_hits.refresh_price_hits() for each item touched.
+    """
+    item = models.OneToOneField(Item, on_delete=models.CASCADE, primary_key=True, related_name='price_hit')
+    accumulation_hit = models.ForeignKey(
+        Transaction, on_delete=models.SET_NULL, null=True, blank=True, related_name='+'
+    )
+    accumulation_hit_at = models.DateTimeField(null=True, blank=True)
+    target_hit = models.ForeignKey(
+        Transaction, on_delete=models.SET_NULL, null=True, blank=True, related_name='+'
+    )
+    target_hit_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.item.name} hits: acc {self.accumulation_hit_at}, target {self.target_hit_at}"
+
+
 class Membership(models.Model):
     account_name = models.CharField(max_length=100, unique=True)
     membership_status = models.CharField(max_length=10, default="No")  # "Yes"/"No"
@@ -0,0 +1,121 @@
+# trades/pagination.py
+# Seek ("keyset") pagination for the transaction tables, newest first.
+# A page is found by filtering past the (date_of_holding, id) of the row at
+# the edge of the previous page instead of OFFSET-ing, and no COUNT(*) is
+# run, so a deep page costs the same as the first one.
+import base64
+from datetime import datetime
+
+from django.db.models import Q
+
+NEWEST_FIRST = ('-date_of_holding', '-id')
+OLDEST_FIRST = ('date_of_holding', 'id')
+
+OLDER = 'o'  # Cursor pointing at the rows after a page (the "next" link)
+NEWER = 'n'  # Cursor pointing at the rows before a page (the "previous" link)
+
+
+def encode_cursor(direction, row=None):
+    """
+    Opaque URL-safe token for the page next to `row` in `direction`.
+    Without a row, NEWER means the oldest page (the "last" link).
+    """
+    raw = direction if row is None else f"{direction}{row.date_of_holding.isoformat()}|{row.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    (direction, date, id) for a token from encode_cursor(), with date and
+    id None for the oldest page. None when there is no cursor or it can't
+    be read (old page numbers, edited URLs), which means the first page.
+    """
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        direction, position = raw[:1], raw[1:]
+        if direction not in (OLDER, NEWER):
+            return None
+        if not position:
+            return (NEWER, None, None) if direction == NEWER else None
+        date_str, pk = position.rsplit('|', 1)
+        return direction, datetime.fromisoformat(date_str), int(pk)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+class KeysetPage:
+    """
+    One page of rows, shaped like the parts of django.core.paginator.Page the
+    templates use (iteration, has_next/has_previous/has_other_pages), plus
+    cursors for the links: next_cursor, previous_cursor and last_cursor (an
+    empty cursor is the first page). `cursor` is the token that produced
+    this page.
+    """
+    last_cursor = encode_cursor(NEWER)
+
+    def __init__(self, object_list, cursor, has_next, has_previous):
+        self.object_list = object_list
+        self.cursor = cursor
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def __repr__(self):
+        return f"<KeysetPage of {len(self.object_list)} rows>"
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+    @property
+    def next_cursor(self):
+        return encode_cursor(OLDER, self.object_list[-1]) if self._has_next and self.object_list else None
+
+    @property
+    def previous_cursor(self):
+        return encode_cursor(NEWER, self.object_list[0]) if self._has_previous and self.object_list else None
+
+
+def paginate_by_date(queryset, cursor=None, per_page=25):
+    """
+    The page of `queryset` (Transactions, or anything with date_of_holding
+    and id) that `cursor` points to, ordered newest first. Any ordering on
+    the queryset is replaced. Reads at most per_page + 1 rows.
+    """
+    position = decode_cursor(cursor)
+    if position is None:
+        rows = list(queryset.order_by(*NEWEST_FIRST)[:per_page + 1])
+        return KeysetPage(rows[:per_page], None, len(rows) > per_page, False)
+
+    direction, date, pk = position
+    if direction == OLDER:
+        rows = list(
+            queryset.filter(Q(date_of_holding__lt=date) | Q(date_of_holding=date, id__lt=pk))
+            .order_by(*NEWEST_FIRST)[:per_page + 1]
+        )
+        return KeysetPage(rows[:per_page], cursor, len(rows) > per_page, True)
+
+    # NEWER: read backwards from the cursor, then flip the page round
+    newer = queryset
+    if date is not None:
+        newer = queryset.filter(Q(date_of_holding__gt=date) | Q(date_of_holding=date, id__gt=pk))
+    rows = list(newer.order_by(*OLDEST_FIRST)[:per_page + 1])
+    if date is not None and len(rows) <= per_page:
+        # Walked back to the newest rows: show a full first page rather than a short one
+        return paginate_by_date(queryset, None, per_page)
+    return KeysetPage(rows[:per_page][::-1], cursor, date is not None, len(rows) > per_page)
@@ -0,0 +1,85 @@
+# trades/price_hits.py
+# Last time each item's accumulation/target sell price was hit (ItemPriceHit)
+from .fifo import BUY_TYPES, SELL_TYPES
+from .models import Transaction, AccumulationPrice, TargetSellPrice, ItemPriceHit
+
+
+def _latest_hit(item_id, trans_types, price_filter):
+    return (
+        Transaction.objects.filter(item_id=item_id, trans_type__in=trans_types, **price_filter)
+        .order_by('-date_of_holding', '-id')
+        .values_list('id', 'date_of_holding')
+        .first()
+    ) or (None, None)
+
+
+def refresh_price_hits(item_id, create=True):
+    """
+    Recompute an item's last hits from its history (all users). Used when a
+    threshold changes, when a transaction is edited or deleted, and for the
+    backfill; the history scan only happens on those writes. With
+    create=False an item without an ItemPriceHit row is left alone (used
+    while rows are being deleted).
+    """
+    accumulation_price = AccumulationPrice.objects.filter(item_id=item_id).values_list(
+        'accumulation_price', flat=True
+    ).first()
+    target_price = TargetSellPrice.objects.filter(item_id=item_id).values_list(
+        'target_sell_price', flat=True
+    ).first()
+
+    acc_hit, acc_at = (None, None)
+    if accumulation_price is not None:
+        acc_hit, acc_at = _latest_hit(item_id, BUY_TYPES, {'price__lte': accumulation_price})
+    target_hit, target_at = (None, None)
+    if target_price is not None:
+        target_hit, target_at = _latest_hit(item_id, SELL_TYPES, {'price__gte': target_price})
+
+    values = {
+        'accumulation_hit_id': acc_hit, 'accumulation_hit_at': acc_at,
+        'target_hit_id': target_hit, 'target_hit_at': target_at,
+    }
+    if create:
+        ItemPriceHit.objects.update_or_create(item_id=item_id, defaults=values)
+    else:
+        ItemPriceHit.objects.filter(item_id=item_id).update(**values)
+
+
+def record_price_hit(trans):
+    """
+    Check a newly inserted transaction against its item's thresholds and,
+    if it hits one and is the latest hit, record it. No history is read.
+    """
+    if trans.trans_type in BUY_TYPES:
+        threshold = AccumulationPrice.objects.filter(item_id=trans.item_id).values_list(
+            'accumulation_price', flat=True
+        ).first()
+        if threshold is None or trans.price > threshold:
+            return
+        field = 'accumulation_hit'
+    elif trans.trans_type in SELL_TYPES:
+        threshold = TargetSellPrice.objects.filter(item_id=trans.item_id).values_list(
+            'target_sell_price', flat=True
+        ).first()
+        if threshold is None or trans.price < threshold:
+            return
+        field = 'target_hit'
+    else:
+        return
+
+    hit = ItemPriceHit.objects.filter(item_id=trans.item_id).first()
+    if hit is None:
+        # First hit we know of for this item: build the row from its history
+        refresh_price_hits(trans.item_id)
+        return
+    last_at = getattr(hit, f'{field}_at')
+    if last_at is None or trans.date_of_holding >= last_at:
+        setattr(hit, f'{field}_id', trans.id)
+        setattr(hit, f'{field}_at', trans.date_of_holding)
+        hit.save(update_fields=[f'{field}', f'{field}_at'])
+
+
+def last_price_hits(item):
+    """(last accumulation hit time, last target sell hit time) for `item`; None where never hit."""
+    hit = ItemPriceHit.objects.filter(item=item).values_list('accumulation_hit_at', 'target_hit_at').first()
+    return hit or (None, None)
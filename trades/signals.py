@@ -1,8 +1,21 @@
 # trades/signals.py
-from django.db.models.signals import post_save
+from django.core.signals import request_started
+from django.db.models.signals import pre_save, post_save, post_delete
 from django.dispatch import receiver
 from django.conf import settings
-from .models import UserProfile # Use relative import
+from django.db.models import Q
+from .models import ( # Use relative import
+    UserProfile, Alias, Item, Transaction, AccumulationPrice, TargetSellPrice, ItemPriceHit,
+    WealthData,
+)
+from .item_resolver import invalidate_resolver_cache, recheck_resolver_version
+from .price_hits import record_price_hit, refresh_price_hits
+from .chart_cache import bump_chart_data_version
+
+# Saving only these fields can change whether a transaction hits a threshold
+PRICE_HIT_FIELDS = {'item', 'item_id', 'trans_type', 'price', 'date_of_holding'}
+# Fields only the FIFO engine writes; it bumps the chart versions itself
+PROFIT_FIELDS = {'realised_profit', 'cumulative_profit'}
 
 # Receiver called when a User object is saved
 @receiver(post_save, sender=settings.AUTH_USER_MODEL)
@@ -22,4 +35,88 @@ def create_or_update_user_profile(sender, instance, created, **kwargs):
         except UserProfile.DoesNotExist:
              # If profile somehow got deleted, recreate it
              UserProfile.objects.create(user=instance)
-             print(f"Re-created missing profile for user {instance.username}") # Optional
\ No newline at end of file
+             print(f"Re-created missing profile for user {instance.username}") # Optional
+
+
+# Keep the in-memory alias/item lookup (trades.item_resolver) in step with the tables
+@receiver(post_save, sender=Alias)
+@receiver(post_delete, sender=Alias)
+@receiver(post_save, sender=Item)
+@receiver(post_delete, sender=Item)
+def invalidate_item_resolver(sender, **kwargs):
+    invalidate_resolver_cache()
+
+
+@receiver(request_started)
+def recheck_item_resolver(sender, **kwargs):
+    recheck_resolver_version()
+
+
+# Keep ItemPriceHit (trades.price_hits) current. Queryset .update()/bulk_create() send no
+# signals: whoever uses them on transactions or thresholds calls refresh_price_hits() itself
+@receiver(post_save, sender=Transaction)
+def track_price_hits_on_save(sender, instance, created, update_fields=None, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        record_price_hit(instance)
+        return
+    if update_fields is not None and not PRICE_HIT_FIELDS.intersection(update_fields):
+        return # e.g. the FIFO engine writing profits
+    # An edit can move a hit to another item, so also refresh any item it was the hit for
+    item_ids = {instance.item_id}
+    item_ids.update(ItemPriceHit.objects.filter(
+        Q(accumulation_hit=instance) | Q(target_hit=instance)
+    ).values_list('item_id', flat=True))
+    for item_id in item_ids:
+        refresh_price_hits(item_id)
+
+
+@receiver(post_delete, sender=Transaction)
+def track_price_hits_on_delete(sender, instance, **kwargs):
+    # The hit FKs are SET_NULL, so a deleted hit shows up as a time without a transaction
+    lost_hit = ItemPriceHit.objects.filter(item_id=instance.item_id).filter(
+        Q(accumulation_hit__isnull=True, accumulation_hit_at__isnull=False) |
+        Q(target_hit__isnull=True, target_hit_at__isnull=False)
+    ).exists()
+    if lost_hit:
+        refresh_price_hits(instance.item_id, create=False)
+
+
+@receiver(post_save, sender=AccumulationPrice)
+@receiver(post_save, sender=TargetSellPrice)
+def track_price_hits_on_threshold_change(sender, instance, raw=False, **kwargs):
+    if not raw:
+        refresh_price_hits(instance.item_id)
+
+
+@receiver(post_delete, sender=AccumulationPrice)
+@receiver(post_delete, sender=TargetSellPrice)
+def track_price_hits_on_threshold_delete(sender, instance, **kwargs):
+    refresh_price_hits(instance.item_id, create=False)
+
+
+# Bump the data versions the cached chart images (trades.chart_cache) are keyed on
+@receiver(pre_save, sender=Transaction)
+def bump_chart_versions_on_item_change(sender, instance, update_fields=None, raw=False, **kwargs):
+    if raw or instance.pk is None or (update_fields is not None and 'item' not in update_fields):
+        return
+    old_item_id = Transaction.objects.filter(pk=instance.pk).values_list('item_id', flat=True).first()
+    if old_item_id is not None and old_item_id != instance.item_id:
+        bump_chart_data_version('item', old_item_id)
+
+
+@receiver(post_save, sender=Transaction)
+@receiver(post_delete, sender=Transaction)
+def bump_chart_versions_on_transaction(sender, instance, update_fields=None, raw=False, **kwargs):
+    if raw or (update_fields is not None and PROFIT_FIELDS.issuperset(update_fields)):
+        return
+    bump_chart_data_version('user', instance.user_id)
+    bump_chart_data_version('item', instance.item_id)
+
+
+@receiver(post_save, sender=WealthData)
+@receiver(post_delete, sender=WealthData)
+def bump_chart_versions_on_wealth(sender, instance, raw=False, **kwargs):
+    if not raw:
+        bump_chart_data_version('wealth', instance.account_name)
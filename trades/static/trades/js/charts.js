@@ -0,0 +1,197 @@
+// trades/static/trades/js/charts.js
+// Draws the charts in the browser from the JSON endpoints (views.*_chart_data)
+// as canvas line charts. Markup:
+//   <div class="js-chart" data-chart-url="...json url...">
+//       <img data-src="...png url..." alt="...">
+//       <noscript><img src="...png url..." alt="..."></noscript>
+//   </div>
+// If the browser can't draw on a canvas or the request fails, the
+// server-rendered PNG is shown instead.
+(function () {
+    const HEIGHT = 400;
+    const PAD = { top: 36, right: 16, bottom: 32, left: 80 };
+    const COLORS = { text: '#ccc', grid: '#333', axis: '#444', cursor: '#888' };
+
+    function showPng(container) {
+        const img = container.querySelector('img[data-src]');
+        if (img && !img.getAttribute('src')) {
+            img.setAttribute('src', img.dataset.src);
+        }
+    }
+
+    function showMessage(container, text) {
+        const note = document.createElement('p');
+        note.className = 'chart-message';
+        note.textContent = text;
+        container.replaceChildren(note);
+    }
+
+    function formatNumber(value) {
+        return value == null ? '' : Math.round(value).toLocaleString();
+    }
+
+    function formatDate(seconds, span) {
+        const date = new Date(seconds * 1000);
+        if (span > 3 * 365 * 86400) {
+            return String(date.getUTCFullYear());
+        }
+        const options = { timeZone: 'UTC', month: 'short', year: 'numeric' };
+        if (span < 120 * 86400) {
+            options.day = 'numeric';
+        }
+        return date.toLocaleDateString(undefined, options);
+    }
+
+    function niceTicks(min, max, count) {
+        if (min === max) {
+            const pad = Math.abs(min) || 1;
+            min -= pad;
+            max += pad;
+        }
+        const rough = (max - min) / count;
+        const magnitude = Math.pow(10, Math.floor(Math.log10(rough)));
+        const step = [1, 2, 5, 10].map(m => m * magnitude).find(s => s >= rough);
+        const ticks = [];
+        for (let tick = Math.floor(min / step) * step; tick <= max + step / 2; tick += step) {
+            ticks.push(tick);
+        }
+        return ticks;
+    }
+
+    function draw(container, chart) {
+        if (chart.message || !chart.series.length || !chart.x.length) {
+            showMessage(container, chart.message || 'Nothing to plot');
+            return;
+        }
+        const width = Math.max(Math.min(container.clientWidth || 900, 1000), 300);
+        const ratio = window.devicePixelRatio || 1;
+        const canvas = document.createElement('canvas');
+        canvas.width = width * ratio;
+        canvas.height = HEIGHT * ratio;
+        canvas.style.width = width + 'px';
+        canvas.style.height = HEIGHT + 'px';
+        const ctx = canvas.getContext('2d');
+
+        const xs = chart.x;
+        const values = chart.series.flatMap(line => line.values.filter(v => v != null));
+        if (!values.length) {
+            showMessage(container, 'Nothing to plot');
+            return;
+        }
+        const yTicks = niceTicks(Math.min(...values), Math.max(...values), 6);
+        const yMin = yTicks[0], yMax = yTicks[yTicks.length - 1];
+        const xMin = xs[0], xMax = xs[xs.length - 1];
+        const plotWidth = width - PAD.left - PAD.right;
+        const plotHeight = HEIGHT - PAD.top - PAD.bottom;
+        const toX = x => PAD.left + (xMax === xMin ? plotWidth / 2 : (x - xMin) / (xMax - xMin) * plotWidth);
+        const toY = y => PAD.top + (yMax - y) / (yMax - yMin) * plotHeight;
+
+        const legend = document.createElement('div');
+        legend.className = 'chart-legend';
+        const readouts = chart.series.map(line => {
+            const entry = document.createElement('span');
+            const swatch = document.createElement('span');
+            swatch.className = 'chart-swatch';
+            swatch.style.backgroundColor = line.color;
+            const value = document.createElement('span');
+            entry.append(swatch, line.label + ': ', value);
+            legend.append(entry);
+            return value;
+        });
+
+        function render(cursor) {
+            ctx.setTransform(ratio, 0, 0, ratio, 0, 0);
+            ctx.clearRect(0, 0, width, HEIGHT);
+            ctx.font = '12px sans-serif';
+            ctx.fillStyle = COLORS.text;
+            ctx.textAlign = 'center';
+            ctx.fillText(chart.title || '', width / 2, 20);
+
+            ctx.lineWidth = 1;
+            ctx.textAlign = 'right';
+            ctx.textBaseline = 'middle';
+            yTicks.forEach(tick => {
+                ctx.strokeStyle = COLORS.grid;
+                ctx.beginPath();
+                ctx.moveTo(PAD.left, toY(tick));
+                ctx.lineTo(width - PAD.right, toY(tick));
+                ctx.stroke();
+                ctx.fillText(formatNumber(tick), PAD.left - 6, toY(tick));
+            });
+            ctx.textAlign = 'center';
+            ctx.textBaseline = 'top';
+            const xTickCount = Math.min(xs.length, Math.max(2, Math.floor(plotWidth / 120)));
+            for (let i = 0; i < xTickCount; i++) {
+                const x = xTickCount === 1 ? xMin : xMin + (xMax - xMin) * i / (xTickCount - 1);
+                ctx.fillText(formatDate(x, xMax - xMin), toX(x), HEIGHT - PAD.bottom + 8);
+            }
+            ctx.strokeStyle = COLORS.axis;
+            ctx.strokeRect(PAD.left, PAD.top, plotWidth, plotHeight);
+
+            // Lines run across missing values, as the PNG charts do
+            chart.series.forEach(line => {
+                ctx.strokeStyle = line.color;
+                ctx.fillStyle = line.color;
+                ctx.beginPath();
+                let points = 0;
+                line.values.forEach((v, i) => {
+                    if (v == null) {
+                        return;
+                    }
+                    if (points++ === 0) {
+                        ctx.moveTo(toX(xs[i]), toY(v));
+                    } else {
+                        ctx.lineTo(toX(xs[i]), toY(v));
+                    }
+                });
+                ctx.stroke();
+                if (points === 1) {
+                    const i = line.values.findIndex(v => v != null);
+                    ctx.fillRect(toX(xs[i]) - 2, toY(line.values[i]) - 2, 4, 4);
+                }
+            });
+
+            const index = cursor == null ? xs.length - 1 : cursor;
+            if (cursor != null) {
+                ctx.strokeStyle = COLORS.cursor;
+                ctx.beginPath();
+                ctx.moveTo(toX(xs[index]), PAD.top);
+                ctx.lineTo(toX(xs[index]), PAD.top + plotHeight);
+                ctx.stroke();
+            }
+            chart.series.forEach((line, i) => {
+                readouts[i].textContent = formatNumber(line.values[index]);
+            });
+        }
+
+        canvas.addEventListener('mousemove', event => {
+            const left = event.clientX - canvas.getBoundingClientRect().left;
+            const target = xMin + (left - PAD.left) / plotWidth * (xMax - xMin);
+            let nearest = 0;
+            xs.forEach((x, i) => {
+                if (Math.abs(x - target) < Math.abs(xs[nearest] - target)) {
+                    nearest = i;
+                }
+            });
+            render(nearest);
+        });
+        canvas.addEventListener('mouseleave', () => render(null));
+
+        container.replaceChildren(canvas, legend);
+        render(null);
+    }
+
+    document.addEventListener('DOMContentLoaded', function () {
+        const canDraw = !!(window.fetch && document.createElement('canvas').getContext);
+        document.querySelectorAll('.js-chart[data-chart-url]').forEach(container => {
+            if (!canDraw) {
+                showPng(container);
+                return;
+            }
+            fetch(container.dataset.chartUrl, { credentials: 'same-origin' })
+                .then(response => response.ok ? response.json() : Promise.reject(response.status))
+                .then(chart => draw(container, chart))
+                .catch(() => showPng(container));
+        });
+    });
+})();
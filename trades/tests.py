@@ -1,3 +1,908 @@
-from django.test import TestCase
+import base64
+from io import StringIO
+import math
+import random
+from datetime import datetime, timedelta, timezone as dt_timezone
+from unittest import mock, skipUnless
 
-# Create your tests here.
+import numpy as np
+import pandas as pd
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.signals import request_started
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from . import item_resolver
+from .chart_cache import chart_data_version, rendered_charts
+from .charts import downsample, item_price_series, item_profit_series, wealth_year_totals
+from .fifo import (
+    BUY_TYPES, SELL_TYPES, PLACING_TYPES, apply_new_transaction, calculate_fifo_for_user,
+    process_fifo_jobs, request_fifo_recompute,
+)
+from .fifo_numpy import calculate_fifo_numpy
+from .item_resolver import (
+    alias_for_item, get_or_create_item, invalidate_resolver_cache, item_image_urls, resolve_alias_and_item,
+    resolve_item, suggest_items,
+)
+from .models import (
+    AccumulationPrice, Alias, Item, ItemPriceHit, OpenLot, Position, TargetSellPrice, Transaction, WealthData,
+)
+from .pagination import KeysetPage, paginate_by_date
+from .price_hits import refresh_price_hits
+
+
+class GetOrCreateItemTests(TestCase):
+    def test_item_added_by_another_process_is_reused(self):
+        self.assertIsNone(resolve_item('Abyssal whip'))  # Loads the maps
+        # bulk_create sends no signals, like an insert made by another worker
+        existing = Item.objects.bulk_create([Item(name='Abyssal whip')])[0]
+
+        self.assertEqual(get_or_create_item('Abyssal whip').id, existing.id)
+        self.assertEqual(get_or_create_item('ABYSSAL WHIP ').id, existing.id)
+        self.assertEqual(Item.objects.filter(name__iexact='abyssal whip').count(), 1)
+
+
+class ItemResolverTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='trader', password='pw')
+        self.item = Item.objects.create(name='Abyssal whip')
+        self.alias = Alias.objects.create(full_name='Abyssal whip', short_name='whip')
+
+    def cache_queries(self, queries):
+        return [q['sql'] for q in queries if 'trades_cache' in q['sql']]
+
+    def test_version_is_checked_once_per_request(self):
+        resolve_item('whip')  # Loads the maps
+        request_started.send(sender=self.__class__)
+        with self.assertNumQueries(1):
+            self.assertEqual(resolve_item('whip').id, self.item.id)
+            self.assertEqual(resolve_alias_and_item('Abyssal whip')[0].id, self.alias.id)
+            self.assertEqual(alias_for_item(self.item).id, self.alias.id)
+            suggest_items('aby')
+            item_image_urls()
+
+        self.client.force_login(self.user)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('trades:index'), {'search': 'whip'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len([sql for sql in self.cache_queries(queries) if 'chart_version' not in sql]), 1)
+
+    def test_changes_from_another_process_are_seen_by_the_next_request(self):
+        self.assertIsNone(resolve_item('Dragon claws'))
+        # bulk_create sends no signals; the other process's invalidate_resolver_cache() bumps the version
+        claws = Item.objects.bulk_create([Item(name='Dragon claws')])[0]
+        cache.set(item_resolver.VERSION_KEY, 'changed elsewhere', timeout=None)
+
+        self.assertIsNone(resolve_item('Dragon claws'))  # Same request: not checked again
+        request_started.send(sender=self.__class__)
+        self.assertEqual(resolve_item('Dragon claws').id, claws.id)
+
+    def values(self, results):
+        return [result['value'] for result in results]
+
+    def add_rune_items(self):
+        for name in ['Rune platebody', 'Rune axe', 'Rune', 'Runite bar', 'Adamant platebody']:
+            Item.objects.create(name=name)
+        Alias.objects.create(full_name='Rune platebody', short_name='rpb')
+
+    def test_prefix_matches_come_shortest_first(self):
+        self.add_rune_items()
+        self.assertEqual(self.values(suggest_items('rune', limit=3)), ['Rune', 'Rune axe', 'Rune platebody'])
+        self.assertEqual(suggest_items('RP'), [{'value': 'rpb', 'label': 'rpb (Rune platebody)', 'item': 'Rune platebody'}])
+
+    def test_typos_are_topped_up_with_fuzzy_matches(self):
+        self.add_rune_items()
+        results = self.values(suggest_items('rnue platebody'))
+        self.assertEqual(results[0], 'Rune platebody')
+        self.assertIn('Adamant platebody', results)
+        self.assertNotIn('Rune axe', results)
+
+    def test_limit(self):
+        self.add_rune_items()
+        self.assertEqual(len(suggest_items('rune', limit=2)), 2)
+        self.assertEqual(suggest_items('rune', limit=0), [])
+        Item.objects.bulk_create([Item(name=f'Rune arrow {n}') for n in range(60)])
+        invalidate_resolver_cache()
+
+        self.client.force_login(self.user)
+        url = reverse('trades:item_autocomplete')
+        self.assertEqual(len(self.client.get(url, {'q': 'rune', 'limit': 500}).json()['results']), 50)
+        self.assertEqual(len(self.client.get(url, {'q': 'rune', 'limit': 0}).json()['results']), 1)
+        self.assertEqual(len(self.client.get(url, {'q': 'rune', 'limit': 'lots'}).json()['results']), 10)
+
+    def test_empty_and_short_queries(self):
+        self.add_rune_items()
+        self.assertEqual(suggest_items(''), [])
+        self.assertEqual(suggest_items(None), [])
+        # One character is shorter than an n-gram: prefix matches only, no fuzzy top-up
+        self.assertEqual(self.values(suggest_items('a')), ['Abyssal whip', 'Adamant platebody'])
+        self.assertEqual(suggest_items('q'), [])
+
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('trades:item_autocomplete'), {'q': '   '})
+        self.assertEqual(response.json(), {'query': '', 'results': []})
+
+    def test_suggestions_follow_alias_and_item_saves(self):
+        self.assertEqual(suggest_items('dragon'), [])
+        item = Item.objects.create(name='Dragon scimitar')
+        self.assertEqual(self.values(suggest_items('dragon')), ['Dragon scimitar'])
+
+        item.name = 'Dragon longsword'
+        item.save()
+        self.assertEqual(self.values(suggest_items('dragon')), ['Dragon longsword'])
+
+        Alias.objects.create(full_name='Dragon longsword', short_name='dls')
+        self.assertEqual(suggest_items('dls')[0]['item'], 'Dragon longsword')
+
+    def test_names_match_like_iexact(self):
+        Item.objects.create(name='Straße')
+        for name in ['ABYSSAL WHIP', 'abyssal whip', ' Abyssal whip', 'Abyssal whip ', 'STRASSE', 'strasse', 'STRAßE']:
+            with self.subTest(name=name):
+                expected = Item.objects.filter(name__iexact=name).order_by('id').first()
+                item = resolve_item(name)
+                self.assertEqual(item and item.id, expected and expected.id)
+
+    def add_image_aliases(self):
+        bones = Item.objects.create(name='Dragon bones')
+        Alias.objects.create(full_name='Dragon bones', short_name='dbones')  # No image
+        Alias.objects.create(full_name='Dragon bones', short_name='db', image_file='aliases/db.png')
+        Alias.objects.create(full_name='Dragon bones', short_name='drbones', image_file='aliases/drbones.png')
+        Alias.objects.create(full_name='Rune dart', short_name='rdart', image_file='aliases/rdart.png')  # No item
+        return bones
+
+    def test_image_url_comes_from_the_first_alias_with_an_image(self):
+        bones = self.add_image_aliases()
+        self.assertEqual(item_image_urls(), {bones.id: '/media/aliases/db.png'})
+
+    def test_tables_get_image_urls_without_a_query_per_row(self):
+        bones = self.add_image_aliases()
+        self.client.force_login(self.user)
+        url = reverse('trades:recent_trades')
+
+        def add_trades(count):
+            Transaction.objects.bulk_create([
+                Transaction(user=self.user, item=item, trans_type=Transaction.BUY, price=100, quantity=1)
+                for _ in range(count) for item in (bones, self.item)
+            ])
+
+        add_trades(1)
+        self.client.get(url)  # Loads the maps
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+        add_trades(20)
+        with self.assertNumQueries(len(queries)):
+            response = self.client.get(url)
+
+        urls = {t.item_id: t.item_image_url for t in response.context['transactions']}
+        self.assertEqual(len(response.context['transactions']), 42)
+        self.assertEqual(urls, {bones.id: '/media/aliases/db.png', self.item.id: None})
+        self.assertContains(response, 'src="/media/aliases/db.png"', count=21)
+
+
+class AliasItemLinkTests(TestCase):
+    def backfill(self, *args):
+        out = StringIO()
+        call_command('backfill_alias_items', *args, '--batch-size', '2', stdout=out)
+        return out.getvalue()
+
+    def linked_item_ids(self, *aliases):
+        return [Alias.objects.get(pk=alias.pk).item_id for alias in aliases]
+
+    def test_backfill_links_the_lowest_id_item(self):
+        # bulk_create skips the save() hooks, like rows written before Alias.item existed
+        first, _, other = Item.objects.bulk_create([Item(name='Rune axe'), Item(name='RUNE AXE'), Item(name='Rune pickaxe')])
+        aliases = Alias.objects.bulk_create([
+            Alias(full_name='rune AXE', short_name='raxe'),
+            Alias(full_name='Rune pickaxe', short_name='rpick'),
+            Alias(full_name='Rune dart', short_name='rdart'),
+        ])
+
+        output = self.backfill()
+        self.assertEqual(self.linked_item_ids(*aliases), [first.id, other.id, None])
+        self.assertIn('Linked 2 alias(es) to their item; 1 alias(es) have no matching item.', output)
+        self.assertEqual(resolve_item('raxe').id, first.id)
+
+    def test_all_rechecks_linked_aliases(self):
+        axe, pickaxe = Item.objects.bulk_create([Item(name='Rune axe'), Item(name='Rune pickaxe')])
+        stale, moved = Alias.objects.bulk_create([
+            Alias(full_name='Rune dart', short_name='rdart', item=axe),
+            Alias(full_name='Rune pickaxe', short_name='rpick', item=axe),
+        ])
+
+        self.backfill()  # Only looks at unlinked aliases
+        self.assertEqual(self.linked_item_ids(stale, moved), [axe.id, axe.id])
+
+        self.backfill('--all')
+        self.assertEqual(self.linked_item_ids(stale, moved), [None, pickaxe.id])
+
+    def test_saves_keep_links_in_step(self):
+        alias = Alias.objects.create(full_name='Rune axe', short_name='raxe')
+        self.assertIsNone(alias.item_id)
+
+        axe = Item.objects.create(name='RUNE AXE')
+        self.assertEqual(self.linked_item_ids(alias), [axe.id])
+        # A later item differing only in case doesn't take the aliases over
+        Item.objects.create(name='rune axe')
+        self.assertEqual(self.linked_item_ids(alias), [axe.id])
+        self.assertEqual(Alias.objects.create(full_name='Rune Axe', short_name='ra').item_id, axe.id)
+
+    def test_renaming_an_item_repoints_its_aliases(self):
+        axe = Item.objects.create(name='Rune axe')
+        old = Alias.objects.create(full_name='Rune axe', short_name='raxe')
+        new = Alias.objects.create(full_name='Rune battleaxe', short_name='rbaxe')
+        self.assertEqual(self.linked_item_ids(old, new), [axe.id, None])
+
+        axe.name = 'Rune battleaxe'
+        axe.save()
+        self.assertEqual(self.linked_item_ids(old, new), [None, axe.id])
+        self.assertEqual(resolve_item('rbaxe').id, axe.id)
+        self.assertIsNone(resolve_item('raxe'))
+
+
+class LedgerAssertions:
+    """Compare what the FIFO engine leaves behind: profits, open lots and positions."""
+    def ledger(self, user):
+        transactions = dict(
+            (trans_id, (realised, cumulative))
+            for trans_id, realised, cumulative in Transaction.objects.filter(user=user)
+            .values_list('id', 'realised_profit', 'cumulative_profit')
+        )
+        lots = sorted(OpenLot.objects.filter(user=user).values_list(
+            'source_transaction_id', 'item_id', 'quantity', 'price',
+        ))
+        positions = sorted(Position.objects.filter(user=user).values_list(
+            'item_id', 'total_bought', 'total_sold', 'remaining_quantity', 'sell_count',
+            'average_sold_price', 'realised_profit', 'last_trade_at',
+        ))
+        return {'transactions': transactions, 'lots': lots, 'positions': positions}
+
+    def assertSameLedger(self, first, second, path='ledger'):
+        if isinstance(first, dict):
+            self.assertEqual(sorted(first), sorted(second), path)
+            for key in first:
+                self.assertSameLedger(first[key], second[key], f'{path}[{key!r}]')
+        elif isinstance(first, (list, tuple)):
+            self.assertEqual(len(first), len(second), path)
+            for index, (a, b) in enumerate(zip(first, second)):
+                self.assertSameLedger(a, b, f'{path}[{index}]')
+        elif isinstance(first, float) or isinstance(second, float):
+            self.assertTrue(math.isclose(first, second, rel_tol=1e-9, abs_tol=1e-9), f'{path}: {first} != {second}')
+        else:
+            self.assertEqual(first, second, path)
+
+
+@override_settings(FIFO_BACKGROUND_RECOMPUTE=False)
+class IncrementalFifoTests(LedgerAssertions, TestCase):
+    """
+    Every shortcut the engine takes (adds through the OpenLot ledger, replays
+    from `since`, item-scoped replays, queued jobs, in-place Position updates)
+    must leave exactly what a full replay of the history does.
+    """
+    TYPES = [Transaction.BUY, Transaction.BUY, Transaction.INSTANT_BUY,
+             Transaction.SELL, Transaction.INSTANT_SELL, Transaction.PLACING_SELL]
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='trader', password='pw')
+        self.items = [Item.objects.create(name=f'Item {n}') for n in range(3)]
+        self.rng = random.Random(7)
+        self.start = datetime(2024, 1, 1, tzinfo=dt_timezone.utc)
+
+    def add(self, minutes):
+        trans = Transaction.objects.create(
+            user=self.user, item=self.rng.choice(self.items), trans_type=self.rng.choice(self.TYPES),
+            price=float(self.rng.randint(1, 500)), quantity=float(self.rng.randint(1, 20)),
+            date_of_holding=self.start + timedelta(minutes=minutes),
+        )
+        apply_new_transaction(trans)
+        return trans
+
+    def build_history(self, count=150):
+        # Mostly appended in date order (the OpenLot fast path); every tenth one is backdated
+        return [self.add(n * 60 if n % 10 else self.rng.randrange(n * 60 + 1)) for n in range(count)]
+
+    def edit_and_delete(self, history, edits=20, deletes=10):
+        """Edit and delete like the index view does, recomputing after each change."""
+        for trans in self.rng.sample(history, edits + deletes)[:edits]:
+            previous_item_id = trans.item_id
+            trans.item = self.rng.choice(self.items)
+            trans.trans_type = self.rng.choice(self.TYPES)
+            trans.price = float(self.rng.randint(1, 500))
+            trans.quantity = float(self.rng.randint(1, 20))
+            trans.save()
+            request_fifo_recompute(self.user, since=trans.date_of_holding, items=[trans.item_id, previous_item_id])
+        remaining = list(Transaction.objects.filter(user=self.user))
+        for trans in self.rng.sample(remaining, deletes):
+            date, item_id = trans.date_of_holding, trans.item_id
+            trans.delete()
+            request_fifo_recompute(self.user, since=date, items=[item_id])
+
+    def assertMatchesFullReplay(self):
+        incremental = self.ledger(self.user)
+        calculate_fifo_for_user(self.user)
+        self.assertSameLedger(incremental, self.ledger(self.user))
+
+    def test_adds_match_full_replay(self):
+        self.build_history()
+        self.assertMatchesFullReplay()
+
+    def test_edits_and_deletes_match_full_replay(self):
+        history = self.build_history()
+        self.edit_and_delete(history)
+        self.assertMatchesFullReplay()
+
+    def test_replay_since_for_all_items_matches_full_replay(self):
+        history = self.build_history()
+        trans = history[75]
+        Transaction.objects.filter(id=trans.id).update(quantity=trans.quantity + 5)
+        request_fifo_recompute(self.user, since=trans.date_of_holding)
+        self.assertMatchesFullReplay()
+
+    def test_queued_recomputes_match_full_replay(self):
+        history = self.build_history()
+        with override_settings(FIFO_BACKGROUND_RECOMPUTE=True):
+            self.edit_and_delete(history)
+            # Adds made while jobs are pending are queued too
+            for n in range(5):
+                self.add(200 * 60 + n)
+            self.assertTrue(process_fifo_jobs())
+        self.assertMatchesFullReplay()
+
+
+class FifoEngineTests(LedgerAssertions, TestCase):
+    """The NumPy engine leaves the same ledger as the loop engine."""
+    def setUp(self):
+        self.user = User.objects.create_user(username='trader', password='pw')
+        self.start = datetime(2024, 1, 1, tzinfo=dt_timezone.utc)
+        self.minutes = 0
+
+    def add(self, item, trans_type, price, quantity):
+        self.minutes += 1
+        Transaction.objects.create(
+            user=self.user, item=item, trans_type=trans_type, price=price, quantity=quantity,
+            date_of_holding=self.start + timedelta(minutes=self.minutes),
+        )
+
+    def assertEnginesAgree(self):
+        calculate_fifo_for_user(self.user)
+        loop = self.ledger(self.user)
+        Transaction.objects.filter(user=self.user).update(realised_profit=0.0, cumulative_profit=0.0)
+        calculate_fifo_numpy(self.user)
+        self.assertSameLedger(loop, self.ledger(self.user))
+
+    def test_random_histories(self):
+        rng = random.Random(3)
+        items = [Item.objects.create(name=f'Item {n}') for n in range(4)]
+        types = list(BUY_TYPES) + list(SELL_TYPES)
+        for n in range(300):
+            item = items[n % 4]
+            # Items 0-1 trade whole units (vectorised), items 2-3 fractions (lot by lot)
+            quantity = float(rng.randint(1, 20)) if item in items[:2] else round(rng.uniform(0.1, 20), 5)
+            self.add(item, rng.choice(types), float(rng.randint(1, 500)), quantity)
+        self.assertEnginesAgree()
+
+    def test_fractional_leftovers_are_dropped_like_the_loop_engine(self):
+        item = Item.objects.create(name='Fractional')
+        for n in range(200):
+            # Each sell leaves 0.00005 of its buy, which the loop engine throws away
+            self.add(item, Transaction.BUY, 1.0 if n % 2 else 1e9, 1.00005)
+            self.add(item, Transaction.SELL, 2.0, 1.0)
+        self.assertEnginesAgree()
+
+
+class DownsampleTests(TestCase):
+    def setUp(self):
+        days = pd.date_range('2015-01-01', periods=4000, freq='D')
+        self.series = pd.Series(np.sin(np.arange(4000) / 50.0) * 100, index=days)
+        self.series.iloc[1234] = 10_000.0
+        self.series.iloc[2345] = -10_000.0
+
+    def test_long_series_keeps_ends_and_extremes(self):
+        points = downsample(self.series, 500)
+
+        self.assertEqual(len(points), 500)
+        self.assertEqual(points.index[0], self.series.index[0])
+        self.assertEqual(points.index[-1], self.series.index[-1])
+        self.assertEqual(points.max(), 10_000.0)
+        self.assertEqual(points.min(), -10_000.0)
+        self.assertTrue(points.index.is_monotonic_increasing)
+
+    def test_lines_share_the_budget_and_skip_gaps(self):
+        prices = pd.DataFrame({'buy_price': self.series, 'sell_price': -self.series})
+        prices.iloc[:300, 0] = np.nan
+
+        points = downsample(prices, 500)
+
+        self.assertLessEqual(len(points), 500)
+        self.assertEqual(points['buy_price'].max(), 10_000.0)
+        self.assertEqual(points['sell_price'].min(), -10_000.0)
+
+    def test_short_series_is_unchanged(self):
+        short = self.series.iloc[:500]
+        self.assertIs(downsample(short, 500), short)
+
+
+class ChartSeriesTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='trader', password='pw')
+        self.other_user = User.objects.create_user(username='someone-else', password='pw')
+        self.item = Item.objects.create(name='Cannonball')
+        self.start = datetime(2023, 11, 20, 9, 30, tzinfo=dt_timezone.utc)
+        self.client.force_login(self.user)
+        rendered_charts.clear()
+        self.addCleanup(rendered_charts.clear)
+
+    def add(self, trans_type, price, quantity, days, hours=0, user=None):
+        return Transaction.objects.create(
+            user=user or self.user, item=self.item, trans_type=trans_type, price=price, quantity=quantity,
+            date_of_holding=self.start + timedelta(days=days, hours=hours),
+        )
+
+    def add_price_history(self):
+        self.add(Transaction.BUY, 100.0, 10, days=0)
+        self.add(Transaction.BUY, 130.0, 30, days=0, hours=5)
+        self.add(Transaction.SELL, 150.0, 4, days=0, hours=6, user=self.other_user)
+        self.add(Transaction.INSTANT_BUY, 1.0, 1000, days=1)  # Not part of the price chart
+        self.add(Transaction.SELL, 170.0, 6, days=3)
+        self.add(Transaction.SELL, 160.0, 2, days=3, hours=1)
+        self.add(Transaction.BUY, 120.0, 5, days=45)
+        self.add(Transaction.BUY, 0.0, 5, days=46)  # A zero average counts as missing
+        self.add(Transaction.SELL, 180.0, 1, days=400, user=self.other_user)
+
+    def pandas_price_series(self, timeframe):
+        """The weighted averages the way the pre-SQL code worked them out, with day buckets for Daily."""
+        rows = Transaction.objects.filter(item=self.item).values_list('trans_type', 'price', 'quantity', 'date_of_holding')
+        df = pd.DataFrame(list(rows), columns=['trans_type', 'price', 'quantity', 'date'])
+        df['date'] = pd.to_datetime(df['date'], utc=True).dt.tz_localize(None)
+        df['bucket'] = df['date'].dt.to_period({'Monthly': 'M', 'Yearly': 'Y'}.get(timeframe, 'D')).dt.to_timestamp()
+        sides = []
+        for trans_type, column in ((Transaction.BUY, 'buy_price'), (Transaction.SELL, 'sell_price')):
+            side = df[df['trans_type'] == trans_type]
+            sides.append(((side['price'] * side['quantity']).groupby(side['bucket']).sum()
+                          / side['quantity'].groupby(side['bucket']).sum()).rename(column))
+        merged = pd.concat(sides, axis=1).sort_index().replace(0, float('nan'))
+        merged = merged.resample('D').asfreq().ffill()
+        merged.index = merged.index.astype('datetime64[ns]').rename('date')
+        return merged
+
+    def test_sql_buckets_match_pandas(self):
+        self.add_price_history()
+        for timeframe in ('Daily', 'Monthly', 'Yearly'):
+            with self.subTest(timeframe=timeframe):
+                pd.testing.assert_frame_equal(item_price_series(self.item, timeframe),
+                                              self.pandas_price_series(timeframe), check_freq=False)
+
+    def test_json_payload_shape(self):
+        self.add_price_history()
+        response = self.client.get(reverse('trades:item_price_chart_data'), {'search': 'Cannonball'})
+        self.assertEqual(response.status_code, 200)
+        payload = response.json()
+        self.assertEqual(set(payload), {'title', 'message', 'x', 'series'})
+        self.assertEqual(payload['title'], 'Cannonball Price History (Daily)')
+        self.assertIsNone(payload['message'])
+        self.assertTrue(all(isinstance(x, int) for x in payload['x']))
+        self.assertEqual(payload['x'], sorted(payload['x']))
+        self.assertEqual(payload['x'][0], int(datetime(2023, 11, 20, tzinfo=dt_timezone.utc).timestamp()))
+        self.assertEqual([line['label'] for line in payload['series']], ['Buy Price', 'Sell Price'])
+        for line in payload['series']:
+            self.assertEqual(set(line), {'label', 'color', 'values'})
+            self.assertEqual(len(line['values']), len(payload['x']))
+        self.assertEqual(payload['series'][0]['values'][0], 122.5)  # (100*10 + 130*30) / 40
+        self.assertEqual(payload['series'][1]['values'][0], 150.0)
+
+        missing = self.client.get(reverse('trades:item_price_chart_data'), {'search': 'No such item'}).json()
+        self.assertEqual(missing, {'title': 'Price History', 'message': "Item 'No such item' not found",
+                                   'x': [], 'series': []})
+
+    def add_profit_history(self):
+        for days, hours, profit in [(0, 0, 10.0), (0, 5, 5.0), (2, 3, -3.0), (35, 0, 20.0), (80, 10, 1.0)]:
+            trans = self.add(Transaction.SELL, 100.0, 1, days=days, hours=hours)
+            Transaction.objects.filter(pk=trans.pk).update(realised_profit=profit)
+        # Not counted: another user's trade and another item's
+        Transaction.objects.create(user=self.other_user, item=self.item, trans_type=Transaction.SELL, price=1.0,
+                                   quantity=1.0, realised_profit=1000.0, date_of_holding=self.start)
+        Transaction.objects.create(user=self.user, item=Item.objects.create(name='Other'), trans_type=Transaction.SELL,
+                                   price=1.0, quantity=1.0, realised_profit=1000.0, date_of_holding=self.start)
+
+    def test_item_profit_series_daily(self):
+        self.add_profit_history()
+        series = item_profit_series(self.user, self.item, 'Daily')
+
+        # Every day at midnight from the first trade's day to the last's, carrying the total over
+        self.assertEqual(len(series), 81)
+        self.assertEqual(series.index[0], pd.Timestamp('2023-11-20'))
+        self.assertEqual(series.index[-1], pd.Timestamp('2024-02-08'))
+        self.assertTrue((series.index == series.index.normalize()).all())
+        self.assertEqual(series[pd.Timestamp('2023-11-20')], 15.0)
+        self.assertEqual(series[pd.Timestamp('2023-11-21')], 15.0)
+        self.assertEqual(series[pd.Timestamp('2023-11-22')], 12.0)
+        self.assertEqual(series[pd.Timestamp('2023-12-25')], 32.0)
+        self.assertEqual(series.iloc[-1], 33.0)
+        self.assertEqual(series.name, 'cumulative_profit')
+        self.assertEqual(series.index.name, 'date')
+
+    def test_item_profit_series_monthly(self):
+        self.add_profit_history()
+        series = item_profit_series(self.user, self.item, 'Monthly')
+
+        # Months without trades (January) are left out
+        pd.testing.assert_series_equal(series, pd.Series(
+            [12.0, 32.0, 33.0], name='cumulative_profit',
+            index=pd.DatetimeIndex(['2023-11-01', '2023-12-01', '2024-02-01'], dtype='datetime64[ns]', name='date'),
+        ), check_freq=False)
+
+    def test_wealth_year_totals(self):
+        WealthData.objects.create(account_name='trader', year=2024, january='1,000', february='2500.5', march='')
+        WealthData.objects.create(account_name='trader', year=2024, january='250', march='not a number', december='7')
+        # Not counted: another year and another account
+        WealthData.objects.create(account_name='trader', year=2023, january='99999')
+        WealthData.objects.create(account_name='someone-else', year=2024, january='99999')
+
+        self.assertEqual(wealth_year_totals('trader', 2024), [1250.0, 2500.5] + [0.0] * 9 + [7.0])
+        self.assertEqual(wealth_year_totals('nobody', 2024), [0.0] * 12)
+
+    @override_settings(CHART_MAX_POINTS=50)
+    def test_endpoints_keep_to_chart_max_points(self):
+        self.add_price_history()
+        last = self.add(Transaction.SELL, 175.0, 1, days=400)
+        last_day = int(last.date_of_holding.replace(hour=0, minute=0).timestamp())
+        for name in ('item_price_chart_data', 'item_profit_chart_data', 'global_profit_chart_data'):
+            with self.subTest(name=name):
+                payload = self.client.get(reverse(f'trades:{name}'), {'search': 'Cannonball'}).json()
+                self.assertLessEqual(len(payload['x']), 50)
+                self.assertGreater(len(payload['x']), 2)
+                self.assertEqual(payload['x'][-1], last_day)
+                for line in payload['series']:
+                    self.assertEqual(len(line['values']), len(payload['x']))
+
+
+class PriceHitTests(TestCase):
+    """ItemPriceHit, kept up to date by the signal receivers, equals a recomputation from the history."""
+    def setUp(self):
+        self.user = User.objects.create_user(username='trader', password='pw')
+        self.item = Item.objects.create(name='Blood rune')
+        self.other_item = Item.objects.create(name='Death rune')
+        for item in (self.item, self.other_item):
+            AccumulationPrice.objects.create(item=item, accumulation_price=100.0)
+            TargetSellPrice.objects.create(item=item, target_sell_price=200.0)
+        self.start = datetime(2024, 1, 1, tzinfo=dt_timezone.utc)
+
+    def add(self, trans_type, price, days, item=None):
+        return Transaction.objects.create(
+            user=self.user, item=item or self.item, trans_type=trans_type, price=price, quantity=1.0,
+            date_of_holding=self.start + timedelta(days=days),
+        )
+
+    def hits(self, item):
+        row = ItemPriceHit.objects.filter(item=item).values_list(
+            'accumulation_hit_id', 'accumulation_hit_at', 'target_hit_id', 'target_hit_at',
+        ).first()
+        return row or (None, None, None, None)
+
+    def assertMatchesRecompute(self):
+        for item in (self.item, self.other_item):
+            stored = self.hits(item)
+            refresh_price_hits(item.id)
+            self.assertEqual(stored, self.hits(item), item.name)
+
+    def test_inserts_and_backdated_inserts(self):
+        hit = self.add(Transaction.BUY, 90.0, days=5)
+        self.add(Transaction.BUY, 150.0, days=6)  # Above the accumulation price
+        self.add(Transaction.INSTANT_BUY, 80.0, days=2)  # Backdated: not the latest hit
+        sell = self.add(Transaction.SELL, 250.0, days=3)
+
+        self.assertEqual(self.hits(self.item)[::2], (hit.id, sell.id))
+        self.assertMatchesRecompute()
+
+    def test_edits_of_price_and_item(self):
+        older = self.add(Transaction.BUY, 95.0, days=1)
+        latest = self.add(Transaction.BUY, 90.0, days=5)
+
+        latest.price = 150.0
+        latest.save()
+        self.assertEqual(self.hits(self.item)[0], older.id)
+        self.assertMatchesRecompute()
+
+        older.item = self.other_item
+        older.save()
+        self.assertEqual(self.hits(self.item)[0], None)
+        self.assertEqual(self.hits(self.other_item)[0], older.id)
+        self.assertMatchesRecompute()
+
+    def test_deleting_the_hit(self):
+        older = self.add(Transaction.SELL, 210.0, days=1)
+        latest = self.add(Transaction.SELL, 220.0, days=5)
+        self.assertEqual(self.hits(self.item)[2], latest.id)
+
+        latest.delete()
+        self.assertEqual(self.hits(self.item)[2], older.id)
+        self.assertMatchesRecompute()
+
+    def test_threshold_saves_and_deletes(self):
+        cheap = self.add(Transaction.BUY, 70.0, days=1)
+        self.add(Transaction.BUY, 90.0, days=5)
+        self.add(Transaction.SELL, 250.0, days=3)
+
+        threshold = AccumulationPrice.objects.get(item=self.item)
+        threshold.accumulation_price = 80.0
+        threshold.save()
+        self.assertEqual(self.hits(self.item)[0], cheap.id)
+        self.assertMatchesRecompute()
+
+        TargetSellPrice.objects.get(item=self.item).delete()
+        self.assertEqual(self.hits(self.item)[2:], (None, None))
+        self.assertMatchesRecompute()
+
+
+class PaginationTests(TestCase):
+    PER_PAGE = 5
+
+    def setUp(self):
+        user = User.objects.create_user(username='trader', password='pw')
+        item = Item.objects.create(name='Nature rune')
+        start = datetime(2024, 1, 1, tzinfo=dt_timezone.utc)
+        for n in range(23):
+            # Three rows per date, so some page edges fall between rows with the same date (the id tiebreak)
+            Transaction.objects.create(
+                user=user, item=item, trans_type=Transaction.BUY, price=100.0, quantity=1.0,
+                date_of_holding=start + timedelta(days=n // 3),
+            )
+        self.queryset = Transaction.objects.filter(user=user)
+        self.expected = list(self.queryset.order_by('-date_of_holding', '-id').values_list('id', flat=True))
+
+    def page(self, cursor=None):
+        return paginate_by_date(self.queryset, cursor, self.PER_PAGE)
+
+    def ids(self, page):
+        return [row.id for row in page]
+
+    def test_first_page(self):
+        page = self.page()
+        self.assertEqual(self.ids(page), self.expected[:5])
+        self.assertTrue(page.has_next())
+        self.assertFalse(page.has_previous())
+        self.assertIsNone(page.previous_cursor)
+
+    def test_older_and_newer_round_trip(self):
+        pages = [self.page()]
+        while pages[-1].has_next():
+            pages.append(self.page(pages[-1].next_cursor))
+        self.assertEqual([self.ids(page) for page in pages],
+                         [self.expected[start:start + 5] for start in range(0, 23, 5)])
+        self.assertFalse(pages[-1].has_next())
+        self.assertTrue(pages[-1].has_previous())
+
+        back = [pages[-1]]
+        while back[-1].has_previous():
+            back.append(self.page(back[-1].previous_cursor))
+        self.assertEqual([self.ids(page) for page in back[::-1]], [self.ids(page) for page in pages])
+        self.assertIsNone(back[-1].cursor)  # Back at the first page
+
+    def test_last_page(self):
+        page = self.page(KeysetPage.last_cursor)
+        self.assertEqual(self.ids(page), self.expected[-5:])
+        self.assertFalse(page.has_next())
+        self.assertTrue(page.has_previous())
+        self.assertEqual(self.ids(self.page(page.previous_cursor)), self.expected[-10:-5])
+
+    def test_unreadable_cursors_give_the_first_page(self):
+        def token(raw):
+            return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+        for cursor in ['3', 'not base64!', token('x2024-01-01T00:00:00+00:00|5'), token('o2024-01-01|abc'),
+                       token('onot a date|5'), token('o'), base64.urlsafe_b64encode(b'\xff\xfe').decode()]:
+            with self.subTest(cursor=cursor):
+                page = self.page(cursor)
+                self.assertEqual(self.ids(page), self.expected[:5])
+                self.assertIsNone(page.cursor)
+                self.assertFalse(page.has_previous())
+
+
+@override_settings(FIFO_BACKGROUND_RECOMPUTE=False)
+class HoldingsViewTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='trader', password='pw')
+        self.client.force_login(self.user)
+        closed, held = Item.objects.create(name='Dragon bones'), Item.objects.create(name='Abyssal whip')
+        start = datetime(2024, 1, 1, tzinfo=dt_timezone.utc)
+        trades = [
+            (closed, Transaction.BUY, 100, 10), (closed, Transaction.SELL, 150, 10),  # Closed: hidden by default
+            (held, Transaction.BUY, 10, 5), (held, Transaction.SELL, 20, 2),  # 3 still held
+        ]
+        for n, (item, trans_type, price, quantity) in enumerate(trades):
+            apply_new_transaction(Transaction.objects.create(
+                user=self.user, item=item, trans_type=trans_type, price=price, quantity=quantity,
+                date_of_holding=start + timedelta(days=n),
+            ))
+        self.held = held
+
+    def test_total_covers_positions_that_are_not_shown(self):
+        profits = dict(Position.objects.filter(user=self.user).values_list('item_id', 'realised_profit'))
+        self.assertTrue(all(profit > 0 for profit in profits.values()))
+
+        response = self.client.get(reverse('trades:holdings'))
+        self.assertEqual([p.item_id for p in response.context['positions']], [self.held.id])
+        self.assertAlmostEqual(response.context['total_realised_profit'], sum(profits.values()))
+
+        response = self.client.get(reverse('trades:holdings'), {'show': 'all'})
+        self.assertEqual(len(response.context['positions']), 2)
+        self.assertAlmostEqual(response.context['total_realised_profit'], sum(profits.values()))
+
+    def test_total_without_positions(self):
+        Position.objects.filter(user=self.user).delete()
+        response = self.client.get(reverse('trades:holdings'))
+        self.assertEqual(response.context['total_realised_profit'], 0)
+
+
+class ChartCacheTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='trader', password='pw')
+        self.item = Item.objects.create(name='Dragon bones')
+        self.start = datetime(2024, 1, 1, tzinfo=dt_timezone.utc)
+        self.client.force_login(self.user)
+        rendered_charts.clear()
+        self.addCleanup(rendered_charts.clear)
+
+    def add(self, trans_type, price, quantity, days=0):
+        trans = Transaction.objects.create(
+            user=self.user, item=self.item, trans_type=trans_type, price=price, quantity=quantity,
+            date_of_holding=self.start + timedelta(days=days),
+        )
+        apply_new_transaction(trans)
+        return trans
+
+    def get(self, name, search='Dragon bones', timeframe='Daily', **headers):
+        return self.client.get(reverse(f'trades:{name}'), {'search': search, 'timeframe': timeframe}, **headers)
+
+    def versions(self):
+        return chart_data_version('user', self.user.id), chart_data_version('item', self.item.id)
+
+    def test_versions_are_bumped_once_on_commit(self):
+        before = self.versions()
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.add(Transaction.BUY, 100.0, 10)
+            self.add(Transaction.SELL, 150.0, 4, days=1)
+            self.assertEqual(self.versions(), before)
+        self.assertEqual(len(callbacks), 1)
+
+        with CaptureQueriesContext(connection) as queries:
+            callbacks[0]()
+        writes = [q['sql'] for q in queries if q['sql'].startswith(('UPDATE', 'INSERT')) and 'trades_cache' in q['sql']]
+        self.assertEqual(len(writes), 2)  # One per (scope, ident)
+        after = self.versions()
+        self.assertNotEqual(after[0], before[0])
+        self.assertNotEqual(after[1], before[1])
+
+    def test_profit_only_saves_do_not_bump(self):
+        trans = self.add(Transaction.BUY, 100.0, 10)
+        trans.realised_profit = 5.0
+        with self.captureOnCommitCallbacks() as callbacks:
+            trans.save(update_fields=['realised_profit', 'cumulative_profit'])
+        self.assertEqual(callbacks, [])
+
+    def test_headers_and_not_modified(self):
+        self.add(Transaction.BUY, 100.0, 10)
+        for name in ('item_price_chart', 'item_price_chart_data', 'item_profit_chart_data', 'global_profit_chart_data'):
+            with self.subTest(name=name):
+                response = self.get(name)
+                self.assertEqual(response.status_code, 200)
+                etag, last_modified = response['ETag'], response['Last-Modified']
+                self.assertIn('private', response['Cache-Control'])
+                self.assertIn('no-cache', response['Cache-Control'])
+
+                revalidated = self.get(name, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(revalidated.status_code, 304)
+                self.assertEqual(revalidated['ETag'], etag)
+                self.assertEqual(self.get(name, HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304)
+
+    def test_rendered_charts_are_reused(self):
+        self.add(Transaction.BUY, 100.0, 10)
+        with mock.patch('trades.views.item_price_series', wraps=item_price_series) as series:
+            first = self.get('item_price_chart_data')
+            second = self.get('item_price_chart_data')
+        self.assertEqual(series.call_count, 1)
+        self.assertEqual(first.content, second.content)
+        self.assertEqual(first['ETag'], second['ETag'])
+
+    def test_transaction_changes_invalidate(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.add(Transaction.BUY, 100.0, 10)
+        price, profit = self.get('item_price_chart_data'), self.get('item_profit_chart_data')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.add(Transaction.SELL, 150.0, 4, days=1)
+
+        for name, before in (('item_price_chart_data', price), ('item_profit_chart_data', profit)):
+            with self.subTest(name=name):
+                after = self.get(name, HTTP_IF_NONE_MATCH=before['ETag'])
+                self.assertEqual(after.status_code, 200)
+                self.assertNotEqual(after['ETag'], before['ETag'])
+                self.assertNotEqual(after.content, before.content)
+
+    def test_item_changes_invalidate(self):
+        Alias.objects.create(full_name='Dragon bones', short_name='dbones')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.add(Transaction.BUY, 100.0, 10)
+        before = self.get('item_price_chart_data', search='dbones')
+
+        self.item.name = 'Dragon Bones'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.item.save()
+
+        after = self.get('item_price_chart_data', search='dbones', HTTP_IF_NONE_MATCH=before['ETag'])
+        self.assertEqual(after.status_code, 200)
+        self.assertEqual(after.json()['title'], 'Dragon Bones Price History (Daily)')
+
+    def test_least_recently_used_chart_is_evicted(self):
+        self.add(Transaction.BUY, 100.0, 10)
+        timeframes = ['Daily', 'Monthly', 'Yearly']
+        sizes = {timeframe: len(self.get('item_price_chart_data', timeframe=timeframe).content) for timeframe in timeframes}
+        rendered_charts.clear()
+
+        # Room for any two of the three
+        with mock.patch.object(rendered_charts, 'max_bytes', sum(sizes.values()) - 1), \
+                mock.patch('trades.views.item_price_series', wraps=item_price_series) as series:
+            self.get('item_price_chart_data', timeframe='Daily')
+            self.get('item_price_chart_data', timeframe='Monthly')
+            self.get('item_price_chart_data', timeframe='Daily')  # Now the most recently used
+            self.get('item_price_chart_data', timeframe='Yearly')  # Evicts Monthly
+            self.assertEqual(len(rendered_charts), 2)
+            self.assertLessEqual(rendered_charts.size, rendered_charts.max_bytes)
+            self.assertEqual(series.call_count, 3)
+
+            self.get('item_price_chart_data', timeframe='Daily')
+            self.assertEqual(series.call_count, 3)
+            self.get('item_price_chart_data', timeframe='Monthly')
+            self.assertEqual(series.call_count, 4)
+
+
+@skipUnless(connection.vendor == 'postgresql', 'EXPLAIN checks need PostgreSQL')
+class TransactionIndexTests(TestCase):
+    """
+    The item-centric queries behind the index page and the charts can be
+    answered from the Transaction indexes added for them. Sequential scans
+    are switched off for the test transaction so the planner picks the best
+    index even on a table this small.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='trader', password='pw')
+        cls.items = Item.objects.bulk_create([Item(name=f'Item {n}') for n in range(20)])
+        types = [Transaction.BUY, Transaction.SELL, Transaction.INSTANT_BUY, Transaction.INSTANT_SELL,
+                 Transaction.PLACING_BUY]
+        Transaction.objects.bulk_create([
+            Transaction(user=cls.user, item=cls.items[n % 20], trans_type=types[n % 5], price=n, quantity=1)
+            for n in range(2000)
+        ])
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE trades_transaction')
+
+    def setUp(self):
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+
+    def assertUsesIndex(self, queryset, *index_names):
+        plan = queryset.explain()
+        self.assertNotIn('Seq Scan', plan)
+        self.assertTrue(any(name in plan for name in index_names), plan)
+
+    def test_item_history_uses_item_date_index(self):
+        item = self.items[3]
+        history = Transaction.objects.filter(item=item).exclude(trans_type__in=PLACING_TYPES)
+        self.assertUsesIndex(history.order_by('-date_of_holding', '-id')[:25], 'transaction_item_date_idx')
+        self.assertUsesIndex(Transaction.objects.filter(item=item).order_by('date_of_holding', 'id'),
+                             'transaction_item_date_idx')
+
+    def test_price_hit_scan_uses_item_index(self):
+        hits = Transaction.objects.filter(item=self.items[3], trans_type__in=BUY_TYPES, price__lte=500)
+        self.assertUsesIndex(hits.order_by('-date_of_holding', '-id')[:1],
+                             'transaction_item_type_date_idx', 'transaction_item_date_idx')
+
+    def test_placing_orders_use_partial_indexes(self):
+        placing = Transaction.objects.filter(trans_type__in=PLACING_TYPES).order_by('-date_of_holding', '-id')
+        self.assertUsesIndex(placing[:16], 'transaction_placing_date_idx')
+        self.assertUsesIndex(placing.filter(item=self.items[4])[:16],
+                             'transaction_placing_item_idx', 'transaction_placing_date_idx')
@@ -15,10 +15,12 @@ urlpatterns = [
 
     # The *wealth* chart across all years for the logged-in user:
     path('wealth/chart/', views.wealth_chart_all_years, name='wealth_chart_all_years'),
+    path('wealth/chart/data/', views.wealth_chart_data, name='wealth_chart_data'),
 
     # Transactions
     path('transactions/', views.transaction_list, name='transaction_list'),
     path('transaction/add/', views.transaction_add, name='transaction_add'),
+    path('holdings/', views.holdings, name='holdings'),
 
     # Aliases
     path('alias/', views.alias_list, name='alias_list'),
@@ -32,12 +34,18 @@ urlpatterns = [
 
     # Global realized profit chart (for the logged-in user)
     path('charts/global-profit/', views.global_profit_chart, name='global_profit_chart'),
+    path('charts/global-profit/data/', views.global_profit_chart_data, name='global_profit_chart_data'),
+
+    # Item search autocomplete (JSON)
+    path('autocomplete/items/', views.item_autocomplete, name='item_autocomplete'),
 
     # Item price chart
     path('charts/item-price/', views.item_price_chart, name='item_price_chart'),
+    path('charts/item-price/data/', views.item_price_chart_data, name='item_price_chart_data'),
 
     # Item profit chart
     path('charts/item-profit/', views.item_profit_chart, name='item_profit_chart'),
+    path('charts/item-profit/data/', views.item_profit_chart_data, name='item_profit_chart_data'),
 
     # Account & Password Reset
     path('account/', views.account_page, name='account_page'),
@@ -7,39 +7,53 @@ from datetime import datetime
 # Django imports
 from django.shortcuts import render, redirect, get_object_or_404, Http404
 from django.contrib import messages
-from django.http import HttpResponse
+from django.http import HttpResponse, JsonResponse
 from django.db.models import Sum, Avg, Max, F, ExpressionWrapper, fields
 from django.utils import timezone # Already imported
 from django.urls import reverse
 from django.utils.http import urlencode
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth import login, authenticate, logout
-from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
 from django.db import transaction as db_transaction
 
 # Third-party imports
 import matplotlib
 matplotlib.use("Agg") # Set backend before importing pyplot
 import matplotlib.pyplot as plt
-from matplotlib.ticker import StrMethodFormatter, MaxNLocator
-import pandas as pd
-import numpy as np
+from matplotlib.ticker import FuncFormatter, StrMethodFormatter, MaxNLocator
 import pytz
 
 # Local application imports
 from .models import (
     Transaction, Item, Alias, AccumulationPrice, TargetSellPrice,
-    Membership, Watchlist, UserProfile, UserBan, WealthData
+    Membership, Watchlist, UserProfile, UserBan, WealthData, Position
 )
 from .forms import (
     TransactionManualItemForm, TransactionEditForm, AliasForm, AccumulationPriceForm,
     TargetSellPriceForm, MembershipForm, WatchlistForm, PlacingOrderForm,
     UserProfileForm, WealthDataForm
 )
+from .fifo import (
+    apply_new_transaction, request_fifo_recompute, fifo_update_pending,
+    with_running_profit, global_realised_profit as get_global_realised_profit,
+    open_positions, LOT_EPSILON,
+)
+from .price_hits import last_price_hits
+from .pagination import paginate_by_date
+from .chart_cache import cached_chart
+from .charts import (
+    MONTHS, label_format, chart_payload, downsample, global_profit_series, item_price_series, item_profit_series,
+    wealth_year_totals, wealth_all_years_series,
+)
+from .item_resolver import (
+    resolve_item, resolve_alias_and_item, alias_for_item, suggest_items,
+    item_image_urls, attach_item_image_urls,
+)
 # Import middleware if needed (usually not needed in views)
 # from .middleware import TimezoneMiddleware
 
 ADMIN_USERNAME = "Arblack"
+TRANSACTION_LIST_PER_PAGE = 50
 User = get_user_model()
 
 # ==========================
@@ -100,7 +114,7 @@ def index(request):
             if tform.is_valid():
                 new_trans = tform.save(user=request.user)
                 messages.success(request, f"Transaction for {new_trans.item.name} added successfully!")
-                calculate_fifo_for_user(request.user) # Use db_transaction alias if needed
+                apply_new_transaction(new_trans)
                 url = reverse('trades:index')
                 qs = urlencode({'search': new_trans.item.name}) # Redirect to the item searched
                 return redirect(f"{url}?{qs}")
@@ -134,7 +148,10 @@ def index(request):
                     # Recalculate FIFO for the owner of the transaction
                     # We need the user object from the transaction itself now
                     if updated_trans.user:
-                         calculate_fifo_for_user(updated_trans.user)
+                         request_fifo_recompute(
+                             updated_trans.user, since=updated_trans.date_of_holding,
+                             items=[updated_trans.item_id, ef.previous_item_id],
+                         )
                     url = reverse('trades:index')
                     qs = urlencode({'search': updated_trans.item.name})
                     return redirect(f"{url}?{qs}")
@@ -164,12 +181,14 @@ def index(request):
 
                     item_name = t_obj.item.name
                     owner_user = t_obj.user # Get owner before deleting
+                    deleted_date = t_obj.date_of_holding
+                    deleted_item_id = t_obj.item_id
                     t_obj.delete()
                     messages.success(request, "Transaction deleted.")
 
                     # Recalculate FIFO for the user whose transaction was deleted
                     if owner_user:
-                        calculate_fifo_for_user(owner_user)
+                        request_fifo_recompute(owner_user, since=deleted_date, items=[deleted_item_id])
 
                     url = reverse('trades:index')
                     qs = urlencode({'search': item_name}) # Go back to the item's page
@@ -276,47 +295,30 @@ def index(request):
     history_title = ""
 
     # This calculation can stay here as it doesn't depend on search_query
-    global_realised_profit = Transaction.objects.filter(user=request.user).aggregate(total=Max('cumulative_profit'))['total'] or 0
+    global_realised_profit = get_global_realised_profit(request.user)
     potential_profit = None # Initialize variable
 
     # --- Find Item based on search query ---
     if search_query:
-        alias_match = Alias.objects.filter(short_name__iexact=search_query).first()
-        if not alias_match:
-            alias_match = Alias.objects.filter(full_name__iexact=search_query).first()
-        if alias_match:
-            item_obj = Item.objects.filter(name__iexact=alias_match.full_name).first()
-            item_alias = alias_match
-        else:
-            item_obj = Item.objects.filter(name__iexact=search_query).first()
+        item_alias, item_obj = resolve_alias_and_item(search_query)
 
         if item_obj:
             if item_alias is None:
-                item_alias = Alias.objects.filter(full_name__iexact=item_obj.name).first()
+                item_alias = alias_for_item(item_obj)
             accumulation_obj = AccumulationPrice.objects.filter(item=item_obj).first()
             target_obj = TargetSellPrice.objects.filter(item=item_obj).first()
 
             if item_alias and item_alias.image_file:
                 item_image_url = item_alias.image_file.url
+            else:
+                item_image_url = item_image_urls().get(item_obj.id, "")
 
-            # **** Query for Price Hit Timestamps ****
+            # **** Price Hit Timestamps (kept in ItemPriceHit by trades.price_hits) ****
+            acc_hit_at, target_hit_at = last_price_hits(item_obj)
             if accumulation_obj:
-                last_acc_hit = Transaction.objects.filter(
-                    item=item_obj,
-                    trans_type__in=[Transaction.BUY, Transaction.INSTANT_BUY],
-                    price__lte=accumulation_obj.accumulation_price # Price less than or equal to accumulation
-                ).order_by('-date_of_holding').first() # Get the most recent one
-                if last_acc_hit:
-                    last_acc_hit_time = last_acc_hit.date_of_holding
-
+                last_acc_hit_time = acc_hit_at
             if target_obj:
-                last_target_hit = Transaction.objects.filter(
-                    item=item_obj,
-                    trans_type__in=[Transaction.SELL, Transaction.INSTANT_SELL],
-                    price__gte=target_obj.target_sell_price # Price greater than or equal to target
-                ).order_by('-date_of_holding').first() # Get the most recent one
-                if last_target_hit:
-                    last_target_hit_time = last_target_hit.date_of_holding
+                last_target_hit_time = target_hit_at
 
             # Fetch the absolute latest transaction for THIS item by ANY user
             overall_last_tx_for_item = Transaction.objects.filter(
@@ -342,32 +344,27 @@ def index(request):
                 item_transactions_qs = base_history_qs # No user filter
                 history_title = f"All User History for {item_obj.name}"
 
-            item_transactions_qs = item_transactions_qs.order_by('-date_of_holding', '-id')
+            item_transactions_qs = with_running_profit(
+                item_transactions_qs, complete_history=False
+            ).select_related('item', 'user').order_by('-date_of_holding', '-id')
 
             # *** Calculate Stats ***
             # Note: Stats like 'remaining_qty', 'item_profit' are currently calculated
             # ONLY based on the logged-in user's history (item_transactions_qs before filtering logic was split).
             # Decide if these stats should reflect "All User History" when that filter is active.
             # For now, let's keep calculating based on the logged-in user's data for simplicity.
-            user_history_for_stats = base_history_qs.filter(user=request.user) # Query user's data specifically for stats
-            sells = user_history_for_stats.filter(trans_type=Transaction.SELL)
-            instant_sells = user_history_for_stats.filter(trans_type=Transaction.INSTANT_SELL)
-            total_sold_qty = (sells.aggregate(sold_sum=Sum('quantity'))['sold_sum'] or 0) + \
-                             (instant_sells.aggregate(sold_sum=Sum('quantity'))['sold_sum'] or 0)
-            buys_qty = user_history_for_stats.filter(trans_type=Transaction.BUY).aggregate(buy_sum=Sum('quantity'))['buy_sum'] or 0
-            instant_buys_qty = user_history_for_stats.filter(trans_type=Transaction.INSTANT_BUY).aggregate(buy_sum=Sum('quantity'))['buy_sum'] or 0
-            remaining_qty = (buys_qty + instant_buys_qty) - total_sold_qty
-            all_sells_qs = user_history_for_stats.filter(trans_type__in=[Transaction.SELL, Transaction.INSTANT_SELL])
-            avg_sold_price = all_sells_qs.aggregate(avg_price=Avg('price'))['avg_price'] if all_sells_qs.exists() else 0
-            item_profit = user_history_for_stats.aggregate(item_profit_sum=Sum('realised_profit'))['item_profit_sum'] or 0
+            position = Position.objects.filter(user=request.user, item=item_obj).first() # Maintained by trades.fifo
+            if position:
+                total_sold_qty = position.total_sold
+                remaining_qty = position.remaining_quantity
+                avg_sold_price = position.average_sold_price
+                item_profit = position.realised_profit
             # *** End Stat Calculation ***
 
 
-            # Paginate Transaction History (using the filtered qs)
+            # Paginate Transaction History (using the filtered qs), seeking by cursor
             user_items_per_page = 25
-            user_paginator = Paginator(item_transactions_qs, user_items_per_page)
-            user_page_number = request.GET.get('user_page')
-            user_page_obj = user_paginator.get_page(user_page_number)
+            user_page_obj = paginate_by_date(item_transactions_qs, request.GET.get('user_page'), user_items_per_page)
 
         else:
             messages.warning(request, f"No item or alias found matching '{search_query}'.")
@@ -377,11 +374,10 @@ def index(request):
         history_title = "Your Recent Transaction History" # Or "All Recent..."? Defaulting to user's.
         # Optionally fetch recent transactions for the user even without search
         if history_filter == 'my':
-             item_transactions_qs = Transaction.objects.filter(user=request.user).exclude(
+             item_transactions_qs = with_running_profit(Transaction.objects.filter(user=request.user).exclude(
                 trans_type__in=[Transaction.PLACING_BUY, Transaction.PLACING_SELL]
-             ).order_by('-date_of_holding', '-id')[:user_items_per_page] # Show first page directly
-             user_paginator = Paginator(item_transactions_qs, user_items_per_page) # Still needed for page obj
-             user_page_obj = user_paginator.get_page(1) # Get page 1 object
+             ), complete_history=False).select_related('item', 'user')
+             user_page_obj = paginate_by_date(item_transactions_qs, request.GET.get('user_page'), user_items_per_page)
         pass # No item, so last_user_tx_for_item remains None
         # Add logic here if you want to show "All User" recent history by default when no search
 
@@ -404,14 +400,17 @@ def index(request):
         placing_orders_title = f"All Placing Orders"
         if item_obj: placing_orders_title += f" for {item_obj.name}"
 
-    placing_orders_qs = placing_orders_qs.select_related('item', 'user').order_by('-date_of_holding', '-id')
+    placing_orders_qs = placing_orders_qs.select_related('item', 'user')
 
 
-    # Paginate Placing Orders
+    # Paginate Placing Orders (newest first, seeking by cursor)
     placing_orders_per_page = 15
-    placing_orders_paginator = Paginator(placing_orders_qs, placing_orders_per_page)
-    placing_orders_page_number = request.GET.get('placing_page')
-    placing_orders_page_obj = placing_orders_paginator.get_page(placing_orders_page_number)
+    placing_orders_page_obj = paginate_by_date(placing_orders_qs, request.GET.get('placing_page'), placing_orders_per_page)
+
+    # Item icons for both tables, from one shared map
+    attach_item_image_urls(placing_orders_page_obj)
+    if user_page_obj is not None:
+        attach_item_image_urls(user_page_obj)
 
 
     # --- Prepare Context ---
@@ -445,6 +444,7 @@ def index(request):
         'add_transaction_form': add_transaction_form,
         'placing_order_form': placing_order_form,
         'overall_last_tx_for_item': overall_last_tx_for_item,
+        'fifo_pending': fifo_update_pending(request.user),
 
     }
 
@@ -693,7 +693,14 @@ def wealth_mass_delete(request):
     return redirect('trades:wealth_list')
 
 
+def _wealth_chart_dependencies(request):
+    """Cache key parts and data versions for the wealth charts (see trades.chart_cache)."""
+    username = request.user.username
+    return (username, request.GET.get('year', '')), [('wealth', username)]
+
+
 @login_required
+@cached_chart(_wealth_chart_dependencies)
 def wealth_chart(request):
     """
     Show a line chart for the current user, for a selected year or default year.
@@ -709,94 +716,33 @@ def wealth_chart(request):
         selected_year = current_year
 
     # Filter only for this user and this year
-    wealth_records = WealthData.objects.filter(
-        account_name=request.user.username,
-        year=selected_year
-    )
-    months = ["January", "February", "March", "April", "May", "June",
-              "July", "August", "September", "October", "November", "December"]
-    monthly_totals = []
-    for m in months:
-        total = 0
-        for rec in wealth_records:
-            try:
-                val_str = (getattr(rec, m.lower()) or "0").replace(',', '').strip()
-                total += float(val_str)
-            except:
-                total += 0
-        monthly_totals.append(total)
+    monthly_totals = wealth_year_totals(request.user.username, selected_year)
 
     fig, ax = plt.subplots(figsize=(8, 4))
-    ax.plot(months, monthly_totals, linestyle='-', color='green', linewidth=1)
+    ax.plot(MONTHS, monthly_totals, linestyle='-', color='green', linewidth=1)
     ax.set_xlabel("Month")
     ax.set_ylabel("Total Wealth")
     ax.set_title(f"Wealth Totals for {selected_year} (You Only)")
     ax.yaxis.set_major_formatter(StrMethodFormatter('{x:,.0f}'))
     plt.xticks(rotation=45)
     fig.tight_layout()
-
-    buf = io.BytesIO()
-    plt.savefig(buf, format='png')
-    plt.close(fig)
-    buf.seek(0)
-    return HttpResponse(buf.getvalue(), content_type='image/png')
+    return _png_response(fig)
 
 
 @login_required
+@cached_chart(_wealth_chart_dependencies)
 def wealth_chart_all_years(request):
     """
-    Show a line chart for the current user across all years,
-    or optionally for a specific ?year= param if you want.
-    Currently we just show everything for this user.
+    Show a line chart for the current user across all years
+    (months that add up to zero are skipped).
     """
-    selected_year = request.GET.get('year', '')
-    if selected_year.lower() == 'all':
-        wealth_records = WealthData.objects.filter(account_name=request.user.username).order_by('year')
-    else:
-        # If user passes a numeric year, they get that year. If nothing, we do same.
-        # But typically, we do all years for the chart.
-        # For simplicity, let's do all if we want to replicate "All" behavior.
-        wealth_records = WealthData.objects.filter(account_name=request.user.username).order_by('year')
-
-    months = ["January", "February", "March", "April", "May", "June",
-              "July", "August", "September", "October", "November", "December"]
-    monthly_totals = {}
-    for rec in wealth_records:
-        year = rec.year
-        for i, m in enumerate(months, start=1):
-            try:
-                val_str = (getattr(rec, m.lower()) or "0").replace(',', '').strip()
-                val = float(val_str)
-            except:
-                val = 0
-            key = f"{year}-{i:02d}"
-            monthly_totals[key] = monthly_totals.get(key, 0) + val
-
-    # Sort keys and build the chart
-    sorted_keys = sorted(monthly_totals.keys())  # e.g. ['2023-01','2023-02',...]
-    x_labels = []
-    y_values = []
-    for key in sorted_keys:
-        yr, mo = key.split('-')
-        mo_int = int(mo)
-        label = f"{months[mo_int-1][:3]} {yr}"
-        x_labels.append(label)
-        y_values.append(monthly_totals[key])
-
-    # Filter out zero months if you like
-    filtered_x = []
-    filtered_y = []
-    for lbl, val in zip(x_labels, y_values):
-        if val != 0:
-            filtered_x.append(lbl)
-            filtered_y.append(val)
-
-    if filtered_x:
-        x_labels = filtered_x
-        y_values = filtered_y
+    series = wealth_all_years_series(request.user.username)
+    if len(series):
+        x_labels = list(series.index.strftime('%b %Y'))  # e.g. 'Jan 2023'
+        y_values = series.tolist()
     else:
         # fallback if all zero
-        x_labels = months
+        x_labels = MONTHS
         y_values = [0]*12
 
     fig, ax = plt.subplots(figsize=(10, 5))
@@ -807,12 +753,18 @@ def wealth_chart_all_years(request):
     ax.yaxis.set_major_formatter(StrMethodFormatter('{x:,.0f}'))
     plt.xticks(rotation=45)
     fig.tight_layout()
+    return _png_response(fig)
 
-    buf = io.BytesIO()
-    plt.savefig(buf, format='png')
-    plt.close(fig)
-    buf.seek(0)
-    return HttpResponse(buf.getvalue(), content_type='image/png')
+
+@login_required
+@cached_chart(_wealth_chart_dependencies)
+def wealth_chart_data(request):
+    """JSON series behind wealth_chart_all_years, for drawing it in the browser."""
+    series = wealth_all_years_series(request.user.username)
+    title = "All-Year Wealth Totals (You Only)"
+    if not len(series):
+        return JsonResponse(chart_payload(title, message="No wealth data recorded yet"))
+    return JsonResponse(chart_payload(title, series.index, [('Total Wealth', 'green', series)]))
 
 
 @login_required
@@ -863,10 +815,46 @@ def password_reset_request(request):
     return render(request, 'trades/password_reset_request.html')
 
 
+@login_required
+def holdings(request):
+    """
+    Everything the logged-in user currently holds (or, with ?show=all, every
+    item they have traded), read from the Position table plus the average
+    cost of the open FIFO lots.
+    """
+    show_all = request.GET.get('show') == 'all'
+    positions = Position.objects.filter(user=request.user).select_related('item')
+    if not show_all:
+        positions = positions.filter(remaining_quantity__gt=LOT_EPSILON)
+    positions = attach_item_image_urls(list(positions.order_by('item__name')))
+
+    average_costs = {row['item_id']: row['average_cost'] for row in open_positions(request.user)}
+    for position in positions:
+        position.average_cost = average_costs.get(position.item_id)
+    # Over every traded item, including the closed positions the default view hides
+    total_realised_profit = Position.objects.filter(user=request.user).aggregate(
+        total=Sum('realised_profit')
+    )['total'] or 0.0
+
+    return render(request, 'trades/holdings.html', {
+        'positions': positions,
+        'show_all': show_all,
+        'total_realised_profit': total_realised_profit,
+        'fifo_pending': fifo_update_pending(request.user),
+    })
+
+
 @login_required
 def transaction_list(request):
-    transactions = Transaction.objects.filter(user=request.user).order_by('-date_of_holding')
-    return render(request, 'trades/transaction_list.html', {'transactions': transactions})
+    transactions = with_running_profit(
+        Transaction.objects.filter(user=request.user), complete_history=False
+    ).select_related('item')
+    page = paginate_by_date(transactions, request.GET.get('page'), TRANSACTION_LIST_PER_PAGE)
+    return render(request, 'trades/transaction_list.html', {
+        'transactions': page,
+        'page_obj': page,
+        'fifo_pending': fifo_update_pending(request.user),
+    })
 
 
 @login_required
@@ -876,7 +864,7 @@ def transaction_add(request):
         if form.is_valid():
             new_trans = form.save(user=request.user)
             messages.success(request, f"Transaction for {new_trans.item.name} added.")
-            calculate_fifo_for_user(request.user)
+            apply_new_transaction(new_trans)
             return redirect('trades:transaction_list')
     else:
         form = TransactionManualItemForm()
@@ -942,22 +930,29 @@ def recent_trades(request):
         .select_related('item', 'user')
         .order_by('-id')[:50]
     )
-    # Your existing alias image logic...
-    for t in transactions:
-        first_alias = Alias.objects.filter(
-            full_name__iexact=t.item.name,
-            image_file__isnull=False
-        ).first()
-        if first_alias and first_alias.image_file and first_alias.image_file.name:
-            t.first_image_url = first_alias.image_file.url
-        else:
-            t.first_image_url = None
+    # Alias icons come from the shared in-memory map, not a query per row
+    transactions = attach_item_image_urls(list(transactions))
 
     context = {'transactions': transactions}
     return render(request, 'trades/recent_trades.html', context)
 
 
 
+@login_required
+def item_autocomplete(request):
+    """
+    JSON suggestions for the item search box: ?q=<typed text>&limit=<n>.
+    Served from the in-memory name index in trades.item_resolver, so a
+    keystroke never turns into a LIKE '%...%' scan.
+    """
+    query = request.GET.get('q', '').strip()
+    try:
+        limit = min(max(int(request.GET.get('limit', 10)), 1), 50)
+    except ValueError:
+        limit = 10
+    return JsonResponse({'query': query, 'results': suggest_items(query, limit=limit)})
+
+
 def logout_view(request):
     """Custom logout view that handles GET and then redirects to login."""
     logout(request)
@@ -965,90 +960,6 @@ def logout_view(request):
     return redirect('trades:login_view')
 
 
-# ============================
-# calculate_fifo_for_user - Ensure it exists and is correct
-# ============================
-# ... imports, User = get_user_model(), ADMIN_USERNAME ...
-
-def calculate_fifo_for_user(user):
-    User = get_user_model()
-    if not user or not isinstance(user, User):
-        print(f"FIFO Calc: Invalid user object received: {user}")
-        return
-
-    with db_transaction.atomic():
-        Transaction.objects.filter(user=user).update(realised_profit=0.0, cumulative_profit=0.0)
-        purchase_lots = {}
-        cumulative_sum = 0.0
-        user_trans = Transaction.objects.filter(
-            user=user
-        ).exclude(
-            trans_type__in=[Transaction.PLACING_BUY, Transaction.PLACING_SELL]
-        ).order_by('date_of_holding', 'id')
-
-        for trans in user_trans:
-            item_id = trans.item_id
-            if item_id not in purchase_lots:
-                purchase_lots[item_id] = []
-
-            if trans.trans_type in [Transaction.BUY, Transaction.INSTANT_BUY]:
-                purchase_lots[item_id].append({'qty': trans.quantity, 'price': trans.price})
-                trans.realised_profit = 0.0
-
-            elif trans.trans_type in [Transaction.SELL, Transaction.INSTANT_SELL]:
-                qty_to_sell = trans.quantity
-                sell_price = trans.price # <--- ADD THIS LINE BACK
-                profit = 0.0
-                cost_basis = 0.0
-                temp_lots = purchase_lots.get(item_id, [])
-                indices_to_remove = []
-                qty_sold_from_lots = 0
-
-                for i, lot in enumerate(temp_lots):
-                    if qty_sold_from_lots >= qty_to_sell:
-                         break
-                    use_from_lot = min(qty_to_sell - qty_sold_from_lots, lot['qty'])
-                    if use_from_lot <= 0: continue
-                    cost_basis += use_from_lot * lot['price']
-                    lot['qty'] -= use_from_lot
-                    qty_sold_from_lots += use_from_lot
-                    if lot['qty'] <= 0.0001:
-                        indices_to_remove.append(i)
-
-                for index in sorted(indices_to_remove, reverse=True):
-                    if index < len(purchase_lots[item_id]):
-                       purchase_lots[item_id].pop(index)
-                    else:
-                        print(f"FIFO Warning: Index {index} out of bounds for item {item_id} lots.")
-
-                # --- Calculate profit (Reinstating 2% fee example) ---
-                # Now 'sell_price' is defined before being used here
-                sale_value = sell_price * trans.quantity
-                fee = sale_value * 0.02
-                net_sale_value = sale_value - fee
-
-                if abs(qty_sold_from_lots - trans.quantity) > 0.0001:
-                    profit = net_sale_value - cost_basis
-                    print(f"FIFO Warning: Sold {trans.quantity} but only matched {qty_sold_from_lots} from lots for Tx ID {trans.id}. Calculated profit based on matched lots.")
-                else:
-                     profit = net_sale_value - cost_basis
-
-                trans.realised_profit = profit
-                cumulative_sum += profit
-
-            # Update cumulative profit
-            trans.cumulative_profit = cumulative_sum
-            trans.save(update_fields=['realised_profit', 'cumulative_profit'])
-
-
-def calculate_fifo_for_all_users():
-    all_users = User.objects.filter(transaction__isnull=False).distinct()
-    for u in all_users:
-        print(f"Calculating FIFO for user: {u.username}") # Add logging
-        calculate_fifo_for_user(u)
-    print("Finished FIFO calculation for all users.")
-
-
 # --- Admin functionality: user management (list users & ban them) ---
 @login_required
 def user_management(request):
@@ -1086,11 +997,86 @@ def user_management(request):
 # ----------------------------------------------------------------------------
 import matplotlib
 matplotlib.use("Agg")
-from matplotlib.ticker import StrMethodFormatter, MaxNLocator
+from matplotlib.ticker import FuncFormatter, StrMethodFormatter, MaxNLocator
 from django.shortcuts import HttpResponse
 from django.contrib.auth.decorators import login_required
 
+
+def _png_response(fig):
+    buf = io.BytesIO()
+    plt.savefig(buf, format='png')
+    plt.close(fig)
+    return HttpResponse(buf.getvalue(), content_type='image/png')
+
+
+def _day_positions(ax, index, points, fmt):
+    """
+    x positions of `points` (the series on `index`, maybe cut down by
+    downsample()) along `index`, with the x-axis labelled from `index` just
+    like a plot of its strftime(fmt) labels. Spacing stays true to time when
+    points have been dropped in between.
+    """
+    labels = index.strftime(fmt)
+    ax.xaxis.set_major_formatter(FuncFormatter(
+        lambda x, pos: labels[int(round(x))] if 0 <= round(x) < len(labels) else ''
+    ))
+    return index.get_indexer(points.index)
+
+
+def _message_png(text):
+    """A blank chart with `text` in the middle, for when there is nothing to plot."""
+    fig, ax = plt.subplots()
+    ax.text(0.5, 0.5, text, ha='center', va='center')
+    return _png_response(fig)
+
+
+def _profit_chart_dependencies(request):
+    """The global profit chart only depends on the user's own history."""
+    user = request.user
+    return (user.id, user.username, request.GET.get('timeframe', 'Daily')), [('user', user.id)]
+
+
+def _item_chart_dependencies(request, per_user):
+    """
+    Key parts/versions for the item charts. The price chart is drawn from
+    every user's trades of the item (and is shared between users); the
+    profit chart from the requesting user's own.
+    """
+    search_query = request.GET.get('search', '').strip()
+    item_obj = resolve_item(search_query) if search_query else None
+    # Any spelling that resolves to the item gets the same picture
+    item_key = (item_obj.id, item_obj.name) if item_obj else search_query
+    key_parts = (item_key, request.GET.get('timeframe', 'Daily'))
+    if per_user:
+        return (request.user.id,) + key_parts, [('user', request.user.id)]
+    return key_parts, [('item', item_obj.id if item_obj else None)]
+
+
+def _item_price_chart_dependencies(request):
+    return _item_chart_dependencies(request, per_user=False)
+
+
+def _item_profit_chart_dependencies(request):
+    return _item_chart_dependencies(request, per_user=True)
+
+
+def _chart_item(request):
+    """
+    (item, None) for the item named by ?search=, or (None, message) to show
+    instead of the chart when there isn't one.
+    """
+    search_query = request.GET.get('search', '').strip()
+    if not search_query:
+        return None, "No item specified"
+    # Resolve item from short_name or full_name
+    item_obj = resolve_item(search_query)
+    if not item_obj:
+        return None, f"Item '{search_query}' not found"
+    return item_obj, None
+
+
 @login_required
+@cached_chart(_profit_chart_dependencies)
 def global_profit_chart(request):
     """
     Shows the logged-in user's global realized (cumulative) profit over time,
@@ -1101,50 +1087,15 @@ def global_profit_chart(request):
     user = request.user
     timeframe = request.GET.get('timeframe', 'Daily')
 
-    queryset = Transaction.objects.filter(user=user).order_by('date_of_holding', 'id')
-    if not queryset.exists():
-        fig, ax = plt.subplots()
-        ax.text(0.5, 0.5, "No transactions found for global chart", ha='center', va='center')
-        buf = io.BytesIO()
-        plt.savefig(buf, format='png')
-        plt.close(fig)
-        buf.seek(0)
-        return HttpResponse(buf.getvalue(), content_type='image/png')
-
-    # Build DataFrame
-    rows = []
-    for tx in queryset:
-        rows.append({
-            'date': tx.date_of_holding,
-            'cumulative_profit': tx.cumulative_profit
-        })
-    df = pd.DataFrame(rows)
-    df['date'] = pd.to_datetime(df['date'])
-    df.set_index('date', inplace=True)
-
-    # Resample based on timeframe
-    if timeframe == 'Monthly':
-        df = df.resample('MS').last()  # "Month Start"
-    elif timeframe == 'Yearly':
-        df = df.resample('YS').last()  # "Year Start"
-    else:
-        # Daily
-        df = df.resample('D').last()
-
-    # Forward-fill missing data
-    df['cumulative_profit'] = df['cumulative_profit'].ffill()
+    series = global_profit_series(user, timeframe)
+    if series is None:
+        return _message_png("No transactions found for global chart")
 
-    # Build x-label column for plotting
-    if timeframe == 'Monthly':
-        df['x_label'] = df.index.strftime('%Y-%m')
-    elif timeframe == 'Yearly':
-        df['x_label'] = df.index.strftime('%Y')
-    else:
-        df['x_label'] = df.index.strftime('%Y-%m-%d')
-
-    # Plot
+    # Plot; long daily histories are cut down to the point budget first
+    points = downsample(series)
     fig, ax = plt.subplots(figsize=(9, 4))
-    ax.plot(df['x_label'], df['cumulative_profit'], color='blue', linewidth=1, marker='')
+    ax.plot(_day_positions(ax, series.index, points, label_format(timeframe)), points,
+            color='blue', linewidth=1, marker='')
     ax.set_xlabel('Date')
     ax.set_ylabel('Cumulative Profit')
     ax.set_title(f"Global Realized Profit: {user.username} ({timeframe})")
@@ -1153,152 +1104,32 @@ def global_profit_chart(request):
     ax.xaxis.set_major_locator(MaxNLocator(10))
     plt.setp(ax.get_xticklabels(), rotation=45, ha='right')
     fig.tight_layout()
-
-    buf = io.BytesIO()
-    plt.savefig(buf, format='png')
-    plt.close(fig)
-    buf.seek(0)
-    return HttpResponse(buf.getvalue(), content_type='image/png')
+    return _png_response(fig)
 
 
 @login_required
+@cached_chart(_item_price_chart_dependencies)
 def item_price_chart(request):
     """
     Plot buy/sell price lines for the requested item,
     grouping by (Daily/Monthly/Yearly). Now forward-fills missing days
     so lines remain continuous, and uses MaxNLocator to reduce date label clutter.
     """
-    import io
-    user = request.user
-    search_query = request.GET.get('search', '').strip()
     timeframe = request.GET.get('timeframe', 'Daily')
+    item_obj, message = _chart_item(request)
+    if message:
+        return _message_png(message)
 
-    if not search_query:
-        fig, ax = plt.subplots()
-        ax.text(0.5, 0.5, "No item specified", ha='center', va='center')
-        buf = io.BytesIO()
-        plt.savefig(buf, format='png')
-        plt.close(fig)
-        buf.seek(0)
-        return HttpResponse(buf.getvalue(), content_type='image/png')
-
-    # Resolve item from short_name or full_name
-    alias = Alias.objects.filter(short_name__iexact=search_query).first()
-    if not alias:
-        alias = Alias.objects.filter(full_name__iexact=search_query).first()
-    if alias:
-        item_obj = Item.objects.filter(name__iexact=alias.full_name).first()
-    else:
-        item_obj = Item.objects.filter(name__iexact=search_query).first()
-
-    if not item_obj:
-        fig, ax = plt.subplots()
-        ax.text(0.5, 0.5, f"Item '{search_query}' not found", ha='center', va='center')
-        buf = io.BytesIO()
-        plt.savefig(buf, format='png')
-        plt.close(fig)
-        buf.seek(0)
-        return HttpResponse(buf.getvalue(), content_type='image/png')
-
-    qs = Transaction.objects.filter(item=item_obj).order_by('date_of_holding', 'id')
-    if not qs.exists():
-        fig, ax = plt.subplots()
-        ax.text(0.5, 0.5, f"No transactions for '{item_obj.name}'", ha='center', va='center')
-        buf = io.BytesIO()
-        plt.savefig(buf, format='png')
-        plt.close(fig)
-        buf.seek(0)
-        return HttpResponse(buf.getvalue(), content_type='image/png')
-
-    # Build raw DataFrame
-    rows = []
-    for t in qs:
-        rows.append({
-            'trans_type': t.trans_type,
-            'price': t.price,
-            'quantity': t.quantity,
-            'date': t.date_of_holding
-        })
-    df = pd.DataFrame(rows)
-    df['date'] = pd.to_datetime(df['date'])
-    df.set_index('date', inplace=True)
-
-    # Resample based on timeframe
-    if timeframe == 'Monthly':
-        df = df.resample('MS').apply({
-            'trans_type': 'last',
-            'price': 'mean',
-            'quantity': 'sum'
-        })
-    elif timeframe == 'Yearly':
-        df = df.resample('YS').apply({
-            'trans_type': 'last',
-            'price': 'mean',
-            'quantity': 'sum'
-        })
-    else:
-        df = df.resample('D').apply({
-            'trans_type': 'last',
-            'price': 'mean',
-            'quantity': 'sum'
-        })
-
-    # Re-run the original DataFrame (unresampled) to compute weighted average buy/sell prices
-    df_orig = pd.DataFrame(rows)
-    df_orig['date'] = pd.to_datetime(df_orig['date'])
-
-    # Define a function to create a grouping key based on timeframe
-    def date_key(d):
-        if timeframe == 'Monthly':
-            return (d.year, d.month)
-        elif timeframe == 'Yearly':
-            return d.year
-        else:
-            return d
-
-    # Use a temporary grouping key column
-    df_orig['temp_group'] = df_orig['date'].apply(date_key)
-
-    # Compute weighted average buy prices grouped by temp_group
-    buy_df = df_orig[df_orig['trans_type'] == 'Buy'].groupby('temp_group').apply(
-        lambda g: (g['price'] * g['quantity']).sum() / g['quantity'].sum()
-    ).rename('buy_price').reset_index()
-
-    # Compute weighted average sell prices grouped by temp_group
-    sell_df = df_orig[df_orig['trans_type'] == 'Sell'].groupby('temp_group').apply(
-        lambda g: (g['price'] * g['quantity']).sum() / g['quantity'].sum()
-    ).rename('sell_price').reset_index()
-
-    # Merge buy and sell data on temp_group
-    merged = pd.merge(buy_df, sell_df, on='temp_group', how='outer')
-
-    # Convert temp_group back to a real date.
-    def key_to_date(k):
-        if isinstance(k, tuple):  # (year, month)
-            return pd.to_datetime(f"{k[0]}-{k[1]:02d}-01")
-        elif isinstance(k, int):  # year
-            return pd.to_datetime(f"{k}-01-01")
-        else:
-            return pd.to_datetime(k)  # daily is already a date
-
-    merged['date'] = merged['temp_group'].apply(key_to_date)
-    merged.set_index('date', inplace=True)
-    # Replace 0 with NaN to avoid zero dips
-    merged['buy_price'] = merged['buy_price'].replace(0, pd.NA)
-    merged['sell_price'] = merged['sell_price'].replace(0, pd.NA)
-
-    # Resample daily so lines remain continuous; forward-fill missing values
-    merged = merged.resample('D').asfreq()
-    merged['buy_price'] = merged['buy_price'].ffill()
-    merged['sell_price'] = merged['sell_price'].ffill()
-
-    # Build a string x_label for the x-axis
-    merged['x_label'] = merged.index.strftime('%Y-%m-%d')
+    prices = item_price_series(item_obj, timeframe)
+    if prices is None:
+        return _message_png(f"No transactions for '{item_obj.name}'")
 
-    # Plot the chart
+    # Plot the chart; long daily histories are cut down to the point budget first
+    points = downsample(prices)
     fig, ax = plt.subplots(figsize=(10, 4))
-    ax.plot(merged['x_label'], merged['buy_price'], color='green', linewidth=1, marker='', label='Buy Price')
-    ax.plot(merged['x_label'], merged['sell_price'], color='red', linewidth=1, marker='', label='Sell Price')
+    x = _day_positions(ax, prices.index, points, '%Y-%m-%d')
+    ax.plot(x, points['buy_price'], color='green', linewidth=1, marker='', label='Buy Price')
+    ax.plot(x, points['sell_price'], color='red', linewidth=1, marker='', label='Sell Price')
     ax.set_title(f"{item_obj.name} Price History ({timeframe})")
     ax.set_ylabel("Price")
     ax.legend()
@@ -1306,120 +1137,30 @@ def item_price_chart(request):
     ax.xaxis.set_major_locator(MaxNLocator(10))
     plt.setp(ax.get_xticklabels(), rotation=45, ha='right')
     fig.tight_layout()
-
-    buf = io.BytesIO()
-    plt.savefig(buf, format='png')
-    plt.close(fig)
-    buf.seek(0)
-    return HttpResponse(buf.getvalue(), content_type='image/png')
+    return _png_response(fig)
 
 
 @login_required
+@cached_chart(_item_profit_chart_dependencies)
 def item_profit_chart(request):
     """
     Plot item-specific cumulative profit. Now uses MaxNLocator to reduce date labels,
     and still does the monthly/yearly grouping if requested.
     """
-    import io
-    user = request.user
-    search_query = request.GET.get('search', '').strip()
     timeframe = request.GET.get('timeframe', 'Daily')
+    item_obj, message = _chart_item(request)
+    if message:
+        return _message_png(message)
 
-    if not search_query:
-        fig, ax = plt.subplots()
-        ax.text(0.5, 0.5, "No item specified", ha='center', va='center')
-        buf = io.BytesIO()
-        plt.savefig(buf, format='png')
-        plt.close(fig)
-        buf.seek(0)
-        return HttpResponse(buf.getvalue(), content_type='image/png')
-
-    alias = Alias.objects.filter(short_name__iexact=search_query).first()
-    if not alias:
-        alias = Alias.objects.filter(full_name__iexact=search_query).first()
-    if alias:
-        item_obj = Item.objects.filter(name__iexact=alias.full_name).first()
-    else:
-        item_obj = Item.objects.filter(name__iexact=search_query).first()
+    series = item_profit_series(request.user, item_obj, timeframe)
+    if series is None:
+        return _message_png(f"No transactions for '{item_obj.name}'")
 
-    if not item_obj:
-        fig, ax = plt.subplots()
-        ax.text(0.5, 0.5, f"Item '{search_query}' not found", ha='center', va='center')
-        buf = io.BytesIO()
-        plt.savefig(buf, format='png')
-        plt.close(fig)
-        buf.seek(0)
-        return HttpResponse(buf.getvalue(), content_type='image/png')
-
-    qs = Transaction.objects.filter(user=user, item=item_obj).order_by('date_of_holding', 'id')
-    if not qs.exists():
-        fig, ax = plt.subplots()
-        ax.text(0.5, 0.5, f"No transactions for '{item_obj.name}'", ha='center', va='center')
-        buf = io.BytesIO()
-        plt.savefig(buf, format='png')
-        plt.close(fig)
-        buf.seek(0)
-        return HttpResponse(buf.getvalue(), content_type='image/png')
-
-    # Build DataFrame
-    rows = []
-    for t in qs:
-        rows.append({
-            'date': t.date_of_holding,
-            'realised_profit': t.realised_profit
-        })
-    df = pd.DataFrame(rows)
-    df['date'] = pd.to_datetime(df['date'])
-
-    # Group by timeframe (Daily/Monthly/Yearly) and sum realized profits in each bucket
-    def date_key(d):
-        if timeframe == 'Monthly':
-            return (d.year, d.month)
-        elif timeframe == 'Yearly':
-            return d.year
-        else:
-            return d
-
-    df['group_key'] = df['date'].apply(date_key)
-    gp = df.groupby('group_key')['realised_profit'].sum().reset_index()
-    gp.rename(columns={'realised_profit': 'bucket_profit'}, inplace=True)
-
-    # Convert group_key back to a date/time index so we can resample or plot easily
-    def key_to_date(k):
-        if isinstance(k, tuple):
-            return pd.to_datetime(f"{k[0]}-{k[1]:02d}-01")
-        elif isinstance(k, int):
-            return pd.to_datetime(f"{k}-01-01")
-        else:
-            return pd.to_datetime(k)
-
-    gp['date'] = gp['group_key'].apply(key_to_date)
-    gp.sort_values('date', inplace=True)
-    gp.set_index('date', inplace=True)
-
-    # Now compute cumulative sum
-    gp['cumulative_profit'] = gp['bucket_profit'].cumsum()
-
-    # Forward-fill daily if timeframe == Daily. If monthly or yearly,
-    # you can do something similar or just plot as-is:
-    if timeframe == 'Daily':
-        # Reindex to daily range
-        all_days = pd.date_range(gp.index.min(), gp.index.max(), freq='D')
-        gp = gp.reindex(all_days)
-        gp['cumulative_profit'] = gp['cumulative_profit'].ffill()
-
-    # Build string x_label
-    if timeframe == 'Monthly':
-        gp['x_label'] = gp.index.strftime('%Y-%m')
-    elif timeframe == 'Yearly':
-        gp['x_label'] = gp.index.strftime('%Y')
-    else:
-        gp['x_label'] = gp.index.strftime('%Y-%m-%d')
-
-    # Plot
+    # Plot; long daily histories are cut down to the point budget first
+    points = downsample(series)
     fig, ax = plt.subplots(figsize=(10,4))
     ax.plot(
-        gp['x_label'], gp['cumulative_profit'],
+        _day_positions(ax, series.index, points, label_format(timeframe)), points,
         color='blue', linewidth=1, marker='', label='Cumulative Profit'
     )
     ax.set_title(f"{item_obj.name} - Cumulative Profit ({timeframe})")
@@ -1433,8 +1174,54 @@ def item_profit_chart(request):
     plt.setp(ax.get_xticklabels(), rotation=45, ha='right')
 
     fig.tight_layout()
-    buf = io.BytesIO()
-    plt.savefig(buf, format='png')
-    plt.close(fig)
-    buf.seek(0)
-    return HttpResponse(buf.getvalue(), content_type='image/png')
+    return _png_response(fig)
+
+
+# ----------------------------------------------------------------------------
+# JSON versions of the charts above, drawn in the browser (the PNG views stay
+# as the fallback). Payload format: trades.charts.chart_payload
+# ----------------------------------------------------------------------------
+@login_required
+@cached_chart(_profit_chart_dependencies)
+def global_profit_chart_data(request):
+    user = request.user
+    timeframe = request.GET.get('timeframe', 'Daily')
+    title = f"Global Realized Profit: {user.username} ({timeframe})"
+    series = global_profit_series(user, timeframe)
+    if series is None:
+        return JsonResponse(chart_payload(title, message="No transactions found for global chart"))
+    series = downsample(series)
+    return JsonResponse(chart_payload(title, series.index, [('Cumulative Profit', 'blue', series)]))
+
+
+@login_required
+@cached_chart(_item_price_chart_dependencies)
+def item_price_chart_data(request):
+    timeframe = request.GET.get('timeframe', 'Daily')
+    item_obj, message = _chart_item(request)
+    if message:
+        return JsonResponse(chart_payload("Price History", message=message))
+    title = f"{item_obj.name} Price History ({timeframe})"
+    prices = item_price_series(item_obj, timeframe)
+    if prices is None:
+        return JsonResponse(chart_payload(title, message=f"No transactions for '{item_obj.name}'"))
+    prices = downsample(prices)
+    return JsonResponse(chart_payload(title, prices.index, [
+        ('Buy Price', 'green', prices['buy_price']),
+        ('Sell Price', 'red', prices['sell_price']),
+    ]))
+
+
+@login_required
+@cached_chart(_item_profit_chart_dependencies)
+def item_profit_chart_data(request):
+    timeframe = request.GET.get('timeframe', 'Daily')
+    item_obj, message = _chart_item(request)
+    if message:
+        return JsonResponse(chart_payload("Cumulative Profit", message=message))
+    title = f"{item_obj.name} - Cumulative Profit ({timeframe})"
+    series = item_profit_series(request.user, item_obj, timeframe)
+    if series is None:
+        return JsonResponse(chart_payload(title, message=f"No transactions for '{item_obj.name}'"))
+    series = downsample(series)
+    return JsonResponse(chart_payload(title, series.index, [('Cumulative Profit', 'blue', series)]))